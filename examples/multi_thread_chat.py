@@ -9,7 +9,8 @@ Key features:
 - Each thread_id gets its own isolated sandbox
 - Filesystem persists across multiple invocations with the same thread_id
 - Different threads have completely separate filesystems
-- LangGraph checkpointer handles message history
+- LangGraph checkpointer handles message history (SQLite-backed with
+  --checkpoint-db, so a thread's history also survives across runs)
 
 Usage:
     # Start a conversation in thread A
@@ -22,16 +23,30 @@ Usage:
     python multi_thread_chat.py --thread thread-B --query "Read hello.txt"
     # ^ Will fail because thread-B's sandbox doesn't have hello.txt
 
+    # Keep message history across invocations (requires langgraph-checkpoint-sqlite)
+    python multi_thread_chat.py --thread thread-A --checkpoint-db chat.sqlite
+
     # Interactive mode for a specific thread
     python multi_thread_chat.py --thread thread-A
 
     # Delete a thread's sandbox when done
     python multi_thread_chat.py --thread thread-A --delete
+
+    # Keep sandbox clients warm across runs: start a daemon once, then forward
+    # later invocations to it over its Unix socket with --connect (the daemon's
+    # --template/--root-dir/--idle-ttl/--checkpoint-db/--skills apply)
+    python multi_thread_chat.py --daemon
+    python multi_thread_chat.py --connect --thread thread-A --query "Read hello.txt"
 """
 
 import argparse
+import asyncio
+import contextlib
+import functools
+import json
 import os
 import sys
+import threading
 from datetime import timedelta
 
 from deepagents import create_deep_agent
@@ -41,22 +56,44 @@ from src.sandbox_backends.thread_manager import ThreadedSandboxManager
 from src.sandbox_backends.threaded_factory import create_threaded_backend_factory
 
 
-def get_model():
-    """Get the chat model based on available API keys."""
+@functools.lru_cache(maxsize=1)
+def _resolve_model_factory():
+    """Pick the chat model factory from the available API keys (once per process)."""
     if os.environ.get("ANTHROPIC_API_KEY"):
-        from langchain_anthropic import ChatAnthropic
 
-        return ChatAnthropic(model="claude-sonnet-4-20250514")
+        def _anthropic():
+            from langchain_anthropic import ChatAnthropic
+
+            return ChatAnthropic(model="claude-sonnet-4-20250514")
+
+        return _anthropic
 
     if os.environ.get("OPENAI_API_KEY"):
-        from langchain_openai import ChatOpenAI
 
-        return ChatOpenAI(model="gpt-4o")
+        def _openai():
+            from langchain_openai import ChatOpenAI
+
+            return ChatOpenAI(model="gpt-4o")
+
+        return _openai
 
     if os.environ.get("GOOGLE_API_KEY"):
-        from langchain_google_genai import ChatGoogleGenerativeAI
 
-        return ChatGoogleGenerativeAI(model="gemini-1.5-pro")
+        def _google():
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            return ChatGoogleGenerativeAI(model="gemini-1.5-pro")
+
+        return _google
+
+    return None
+
+
+def get_model():
+    """Get the chat model based on available API keys."""
+    factory = _resolve_model_factory()
+    if factory is not None:
+        return factory()
 
     print("Error: No API key found. Set one of:")
     print("  - ANTHROPIC_API_KEY")
@@ -65,8 +102,8 @@ def get_model():
     sys.exit(1)
 
 
-def parse_args():
-    """Parse command line arguments."""
+def _build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
     parser = argparse.ArgumentParser(
         description="Multi-thread chat with per-thread sandbox isolation"
     )
@@ -74,8 +111,7 @@ def parse_args():
         "--thread",
         "-t",
         type=str,
-        required=True,
-        help="Thread ID for this conversation (required)",
+        help="Thread ID for this conversation (required unless --list/--daemon)",
     )
     parser.add_argument(
         "--query",
@@ -111,6 +147,28 @@ def parse_args():
         default=None,
         help="Idle TTL in minutes for auto-cleanup (default: no auto-cleanup)",
     )
+    parser.add_argument(
+        "--checkpoint-db",
+        type=str,
+        default=os.environ.get("AMICABLE_CHAT_CHECKPOINT_DB", ""),
+        help="SQLite file for LangGraph checkpoints (default: in-memory)",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep a sandbox manager running and serve other invocations over --socket",
+    )
+    parser.add_argument(
+        "--connect",
+        action="store_true",
+        help="Forward this invocation to a running --daemon over --socket",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=os.environ.get("AMICABLE_CHAT_SOCKET", "/tmp/amicable-chat.sock"),
+        help="Unix socket of the chat daemon (default: /tmp/amicable-chat.sock)",
+    )
     parser.add_argument(
         "--skills",
         type=str,
@@ -118,11 +176,235 @@ def parse_args():
         default=[".deepagents/skills"],
         help="Skill directories to load (default: .deepagents/skills)",
     )
-    return parser.parse_args()
+    return parser
+
+
+_PARSER = _build_parser()
+
+
+def parse_args():
+    """Parse command line arguments."""
+    return _PARSER.parse_args()
+
+
+async def open_checkpointer(stack: contextlib.AsyncExitStack, db_path: str):
+    """Open the LangGraph checkpointer, preferring SQLite when a path is given.
+
+    MemorySaver keeps every checkpoint of every thread in a Python dict for the
+    lifetime of the process; AsyncSqliteSaver stores them on disk instead.
+    """
+    if db_path:
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            print(
+                "Warning: langgraph-checkpoint-sqlite not installed; "
+                "using in-memory checkpointing"
+            )
+        else:
+            return await stack.enter_async_context(
+                AsyncSqliteSaver.from_conn_string(db_path)
+            )
+    return MemorySaver()
+
+
+def last_ai_message(messages: list):
+    """Return the final AI message of a turn, or None.
+
+    The agent's reply is normally ``messages[-1]``; only a short tail is
+    checked so long threads don't cost a full reverse scan per turn.
+    """
+    for msg in reversed(messages[-5:]):
+        if getattr(msg, "type", None) == "ai" and hasattr(msg, "content"):
+            return msg
+    return None
+
+
+async def ainput(prompt: str) -> str:
+    """Read a line from stdin without blocking the event loop.
+
+    Uses a daemon thread (not the default executor) so Ctrl-C can exit
+    without waiting for the pending read to return.
+    """
+    loop = asyncio.get_running_loop()
+    fut: asyncio.Future[str] = loop.create_future()
+
+    def _resolve(setter, value) -> None:
+        if not fut.done():
+            setter(value)
+
+    def _read() -> None:
+        try:
+            line = input(prompt)
+        except BaseException as exc:  # EOFError / KeyboardInterrupt
+            loop.call_soon_threadsafe(_resolve, fut.set_exception, exc)
+        else:
+            loop.call_soon_threadsafe(_resolve, fut.set_result, line)
+
+    threading.Thread(target=_read, daemon=True).start()
+    return await fut
+
+
+# Settings a --daemon fixes at startup; a --connect client cannot change them.
+_DAEMON_SIDE_OPTIONS = ("template", "root_dir", "idle_ttl", "checkpoint_db", "skills")
+
+# Max size of one JSON-line request/response on the daemon socket.
+_DAEMON_LINE_LIMIT = 16 * 1024 * 1024
+
+
+class LocalChat:
+    """Runs the agent in this process."""
+
+    def __init__(self, args: argparse.Namespace, stack: contextlib.AsyncExitStack):
+        manager_kwargs: dict = {}
+        if args.template:
+            manager_kwargs["template_name"] = args.template
+        if args.root_dir:
+            manager_kwargs["root_dir"] = args.root_dir
+        if args.idle_ttl:
+            manager_kwargs["idle_ttl"] = timedelta(minutes=args.idle_ttl)
+
+        self.manager = ThreadedSandboxManager(**manager_kwargs)
+        self._args = args
+        self._stack = stack
+        self._agent = None
+        # Daemon clients can race on the first ask; build the agent once.
+        self._agent_lock = asyncio.Lock()
+
+    async def _get_agent(self):
+        # Built on first use so --list/--delete don't need a model.
+        async with self._agent_lock:
+            if self._agent is None:
+                checkpointer = await open_checkpointer(
+                    self._stack, self._args.checkpoint_db
+                )
+                self._agent = create_deep_agent(
+                    model=get_model(),
+                    backend=create_threaded_backend_factory(manager=self.manager),
+                    checkpointer=checkpointer,
+                    skills=self._args.skills,
+                )
+        return self._agent
+
+    async def ask(self, thread_id: str, query: str) -> str | None:
+        agent = await self._get_agent()
+        config = {"configurable": {"thread_id": thread_id}}
+        result = await agent.ainvoke({"messages": [("user", query)]}, config=config)
+        msg = last_ai_message(result.get("messages", []))
+        return None if msg is None else str(msg.content)
+
+    async def list_threads(self) -> list[str]:
+        return list(await asyncio.to_thread(self.manager.list_threads))
+
+    async def delete_thread(self, thread_id: str) -> bool:
+        return bool(await asyncio.to_thread(self.manager.delete_thread, thread_id))
+
+
+class DaemonChat:
+    """Forwards requests to a running ``--daemon`` over its Unix socket.
+
+    The daemon keeps one ThreadedSandboxManager (and its K8s clients, sandbox
+    backends, model and checkpointer) alive across CLI invocations.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, socket_path: str) -> "DaemonChat | None":
+        try:
+            reader, writer = await asyncio.open_unix_connection(
+                socket_path, limit=_DAEMON_LINE_LIMIT
+            )
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        return cls(reader, writer)
+
+    async def _call(self, **request) -> dict:
+        self._writer.write(json.dumps(request).encode() + b"\n")
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error") or "daemon request failed")
+        return response
+
+    async def ask(self, thread_id: str, query: str) -> str | None:
+        return (await self._call(op="ask", thread=thread_id, query=query)).get("reply")
+
+    async def list_threads(self) -> list[str]:
+        return list((await self._call(op="list")).get("threads") or [])
+
+    async def delete_thread(self, thread_id: str) -> bool:
+        return bool((await self._call(op="delete", thread=thread_id)).get("deleted"))
+
+    async def close(self) -> None:
+        self._writer.close()
+        with contextlib.suppress(Exception):
+            await self._writer.wait_closed()
+
+
+async def serve_daemon(chat: LocalChat, socket_path: str):
+    """Serve JSON-line requests for ``chat`` on a Unix socket until interrupted."""
+
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    req = json.loads(line)
+                    op = req.get("op")
+                    if op == "ask":
+                        resp = {
+                            "ok": True,
+                            "reply": await chat.ask(req["thread"], req["query"]),
+                        }
+                    elif op == "list":
+                        resp = {"ok": True, "threads": await chat.list_threads()}
+                    elif op == "delete":
+                        resp = {
+                            "ok": True,
+                            "deleted": await chat.delete_thread(req["thread"]),
+                        }
+                    else:
+                        resp = {"ok": False, "error": f"unknown op: {op!r}"}
+                except Exception as e:
+                    resp = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(resp).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    try:
+        _, probe = await asyncio.open_unix_connection(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        # Nothing is listening: clear a socket left behind by a dead daemon.
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+    else:
+        probe.close()
+        print(f"Error: a chat daemon is already listening on {socket_path}")
+        sys.exit(1)
+    server = await asyncio.start_unix_server(
+        _handle, path=socket_path, limit=_DAEMON_LINE_LIMIT
+    )
+    print(f"Serving on {socket_path} (Ctrl-C to stop)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
 
 
-def run_interactive(agent, thread_id: str, config: dict):
-    """Run the agent in interactive mode."""
+async def run_interactive(chat, thread_id: str):
+    """Run the agent in interactive mode.
+
+    The prompt is read off the event loop so checkpoint writes from the
+    previous turn can finish while the user is typing.
+    """
     print(f"\nMulti-Thread Chat (thread: {thread_id})")
     print("=" * 50)
     print("Your sandbox filesystem persists across messages.")
@@ -130,8 +412,8 @@ def run_interactive(agent, thread_id: str, config: dict):
 
     while True:
         try:
-            query = input("You: ").strip()
-        except (KeyboardInterrupt, EOFError):
+            query = (await ainput("You: ")).strip()
+        except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
             print("\nGoodbye!")
             break
 
@@ -143,47 +425,54 @@ def run_interactive(agent, thread_id: str, config: dict):
             break
 
         try:
-            result = agent.invoke({"messages": [("user", query)]}, config=config)
-            messages = result.get("messages", [])
-            for msg in reversed(messages):
-                if hasattr(msg, "content") and msg.type == "ai":
-                    print(f"\nAgent: {msg.content}\n")
-                    break
+            reply = await chat.ask(thread_id, query)
+            if reply is not None:
+                print(f"\nAgent: {reply}\n")
         except Exception as e:
             print(f"\nError: {e}\n")
 
 
-def run_single_query(agent, query: str, config: dict):
+async def run_single_query(chat, thread_id: str, query: str):
     """Run a single query and print the result."""
     print(f"Query: {query}\n")
 
-    result = agent.invoke({"messages": [("user", query)]}, config=config)
-
-    messages = result.get("messages", [])
-    for msg in reversed(messages):
-        if hasattr(msg, "content") and msg.type == "ai":
-            print(f"Agent: {msg.content}")
-            break
+    reply = await chat.ask(thread_id, query)
+    if reply is not None:
+        print(f"Agent: {reply}")
 
 
-def main():
-    """Main entry point."""
-    args = parse_args()
-
-    manager_kwargs: dict = {}
-    if args.template:
-        manager_kwargs["template_name"] = args.template
-    if args.root_dir:
-        manager_kwargs["root_dir"] = args.root_dir
-    if args.idle_ttl:
-        manager_kwargs["idle_ttl"] = timedelta(minutes=args.idle_ttl)
+async def run(args: argparse.Namespace):
+    """Run the requested CLI action."""
+    async with contextlib.AsyncExitStack() as stack:
+        if args.daemon:
+            await serve_daemon(LocalChat(args, stack), args.socket)
+            return
 
-    manager = ThreadedSandboxManager(**manager_kwargs)
+        if not args.thread and not args.list:
+            _PARSER.error("--thread is required")
+
+        if args.connect:
+            overridden = [
+                "--" + name.replace("_", "-")
+                for name in _DAEMON_SIDE_OPTIONS
+                if getattr(args, name) != _PARSER.get_default(name)
+            ]
+            if overridden:
+                _PARSER.error(
+                    f"{', '.join(overridden)}: set on the --daemon, "
+                    "not with --connect"
+                )
+            chat = await DaemonChat.connect(args.socket)
+            if chat is None:
+                _PARSER.error(f"no chat daemon listening on {args.socket}")
+            stack.push_async_callback(chat.close)
+            print(f"Using chat daemon at {args.socket}")
+        else:
+            chat = LocalChat(args, stack)
 
-    try:
         # Handle --list
         if args.list:
-            threads = manager.list_threads()
+            threads = await chat.list_threads()
             if threads:
                 print("Active threads:")
                 for t in threads:
@@ -194,37 +483,29 @@ def main():
 
         # Handle --delete
         if args.delete:
-            if manager.delete_thread(args.thread):
+            if await chat.delete_thread(args.thread):
                 print(f"Deleted sandbox for thread '{args.thread}'")
             else:
                 print(f"No sandbox found for thread '{args.thread}'")
             return
 
-        model = get_model()
-
         print(f"Connecting to sandbox for thread '{args.thread}'...")
-        print(f"  Template: {args.template}")
-
-        checkpointer = MemorySaver()
-
-        agent = create_deep_agent(
-            model=model,
-            backend=create_threaded_backend_factory(manager=manager),
-            checkpointer=checkpointer,
-            skills=args.skills,
-        )
-
-        config = {"configurable": {"thread_id": args.thread}}
-
+        if not args.connect:
+            print(f"  Template: {args.template}")
         print("Initializing sandbox...")
 
         if args.query:
-            run_single_query(agent, args.query, config)
+            await run_single_query(chat, args.thread, args.query)
         else:
-            run_interactive(agent, args.thread, config)
+            await run_interactive(chat, args.thread)
 
-    finally:
-        pass
+
+def main():
+    """Main entry point."""
+    try:
+        asyncio.run(run(parse_args()))
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
 
 
 if __name__ == "__main__":
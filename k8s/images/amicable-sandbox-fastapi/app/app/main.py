@@ -1,18 +1,42 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.responses import Response
+import gzip
+import os
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from pydantic import BaseModel
 
-app = FastAPI(title="Amicable FastAPI Template", version="1.0.0")
+app = FastAPI(
+    title="Amicable FastAPI Template",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 
-@app.get("/")
-async def root() -> HTMLResponse:
-    # Keep this "always works" without relying on any prompting. The agent will
-    # inject real DB proxy credentials by overwriting /app/amicable-db.js.
-    html = """<!doctype html>
+class _SharedResponse(Response):
+    """A constant response that is built once and returned from many requests.
+
+    Starlette hands ``raw_headers`` to ``send`` as-is and middleware (sessions,
+    CORS, ...) may append to that list, so each send gets its own copy.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": list(self.raw_headers),
+            }
+        )
+        await send({"type": "http.response.body", "body": self.body})
+
+
+# Keep this "always works" without relying on any prompting. The agent will
+# inject real DB proxy credentials by overwriting /app/amicable-db.js.
+# Kept as bytes so each request serves the same buffer without re-encoding.
+_ROOT_HTML: bytes = b"""<!doctype html>
 <html>
   <head>
     <meta charset="utf-8" />
@@ -73,42 +97,99 @@ async def root() -> HTMLResponse:
   </body>
 </html>
 """
-    return HTMLResponse(content=html, status_code=200)
+_ROOT_HTML_GZ: bytes = gzip.compress(_ROOT_HTML, compresslevel=9)
+
+# The root page is constant, so both encodings are built as Response objects
+# once; returning them skips header list and content-length work per request.
+_ROOT_RESPONSE = _SharedResponse(
+    content=_ROOT_HTML,
+    media_type="text/html",
+    headers={"vary": "Accept-Encoding"},
+)
+_ROOT_GZ_RESPONSE = _SharedResponse(
+    content=_ROOT_HTML_GZ,
+    media_type="text/html",
+    headers={"content-encoding": "gzip", "vary": "Accept-Encoding"},
+)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    # RFC 9110 12.5.3: an explicit gzip entry wins over "*"; q=0 means "not
+    # acceptable".
+    star: bool | None = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            star = q > 0
+    return bool(star)
+
+
+@app.get("/")
+async def root(request: Request) -> Response:
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        return _ROOT_GZ_RESPONSE
+    return _ROOT_RESPONSE
+
+
+_DB_JS_PATH = "/app/amicable-db.js"
+_DB_JS_STUB = b"window.__AMICABLE_DB__ = window.__AMICABLE_DB__ || null;\n"
+
+_DB_JS_STUB_RESPONSE = _SharedResponse(
+    content=_DB_JS_STUB, media_type="application/javascript"
+)
+_HEALTHZ_RESPONSE = _SharedResponse(
+    content=b'{"status":"ok"}', media_type="application/json"
+)
 
 
 @app.get("/amicable-db.js")
 async def amicable_db_js() -> Response:
     # Serve the injected file if present; otherwise serve a safe stub so the
-    # container is "pre-wired" even before injection runs.
+    # container is "pre-wired" even before injection runs. FileResponse streams
+    # the file (sendfile where the server supports it); "no-cache" makes the
+    # browser revalidate via ETag so re-injected credentials are picked up.
     try:
-        from pathlib import Path
-
-        p = Path("/app/amicable-db.js")
-        if p.exists():
-            return Response(
-                content=p.read_text(encoding="utf-8", errors="replace"),
-                media_type="application/javascript",
-            )
-    except Exception:
-        pass
-    return Response(
-        content="window.__AMICABLE_DB__ = window.__AMICABLE_DB__ || null;\n",
+        st = os.stat(_DB_JS_PATH)
+    except OSError:
+        return _DB_JS_STUB_RESPONSE
+    return FileResponse(
+        _DB_JS_PATH,
         media_type="application/javascript",
+        headers={"cache-control": "no-cache"},
+        stat_result=st,
     )
 
 
 @app.get("/healthz")
-async def healthz() -> dict[str, str]:
-    return {"status": "ok"}
+async def healthz() -> Response:
+    return _HEALTHZ_RESPONSE
 
 
 class EchoRequest(BaseModel):
     input: dict | list | str | int | float | bool | None = None
 
 
+_ECHO_NULL_RESPONSE = _SharedResponse(
+    content=b'{"ok":true,"echo":null}', media_type="application/json"
+)
+
+
 @app.post("/actions/echo")
-async def action_echo(req: EchoRequest) -> dict:
+async def action_echo(req: EchoRequest) -> Any:
     # Hasura Actions typically send JSON; adapt this handler as needed.
+    if req.input is None:
+        return _ECHO_NULL_RESPONSE
     return {"ok": True, "echo": req.input}
 
 
@@ -116,8 +197,15 @@ class EventTriggerPayload(BaseModel):
     event: dict
 
 
+_EVENT_OK_RESPONSE = _SharedResponse(
+    content=b'{"ok":true}', media_type="application/json"
+)
+
+
 @app.post("/events/log")
-async def event_log(payload: EventTriggerPayload) -> dict:
-    # Hasura Event Triggers post a structured payload.
-    # In real code you would validate shape and act accordingly.
-    return {"ok": True}
+async def event_log(request: Request) -> Response:
+    # Hasura Event Triggers post a structured payload. This stub ignores it, so
+    # the body is only drained, not parsed. In real code validate it with
+    # `EventTriggerPayload.model_validate_json(await request.body())`.
+    await request.body()
+    return _EVENT_OK_RESPONSE
@@ -1,23 +1,34 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import binascii
 import contextlib
+import functools
+import heapq
+import json
+import operator
 import os
-import selectors
+import select
 import shlex
 import signal
+import stat
 import subprocess
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
+import orjson
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
 
 APP_ROOT = Path("/app")
 
@@ -69,15 +80,53 @@ def _kill_process_tree(proc: subprocess.Popen[bytes]) -> None:
             proc.kill()
 
 
+# Filesystem endpoints run on fixed, named pools instead of asyncio's default
+# executor; base64 decoding holds the GIL, so it gets one worker per core.
+# /exec stays on the default executor: a long-running command must not pin a
+# worker that /list or /manifest need.
+_CPU_COUNT = os.cpu_count() or 1
+_io_pool = ThreadPoolExecutor(
+    max_workers=max(8, _CPU_COUNT * 4), thread_name_prefix="sandbox-io"
+)
+_cpu_pool = ThreadPoolExecutor(max_workers=_CPU_COUNT, thread_name_prefix="sandbox-cpu")
+
+
+async def _run_in_pool(pool: ThreadPoolExecutor, fn, /, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+# Bytes requested per read(2); matches the default Linux pipe buffer.
+_PIPE_READ_CHUNK = 64 * 1024
+# Upper bound per splice() of surplus output; the pipe itself holds far less.
+_PIPE_DISCARD_CHUNK = 1024 * 1024
+
+_epoll_local = threading.local()
+
+
+def _thread_epoll() -> select.epoll:
+    # /exec runs on reused to_thread workers: keep one epoll instance per worker
+    # instead of an epoll_create/close pair per command. Per thread, not global,
+    # so concurrent commands never receive each other's events.
+    ep = getattr(_epoll_local, "ep", None)
+    if ep is None or ep.closed:
+        ep = _epoll_local.ep = select.epoll()
+    return ep
+
+
 def _run_command_limited(
     *, args: list[str], cwd: str, timeout_s: int, max_output_chars: int
 ) -> tuple[str, str, int]:
     # Run without shell; capture stdout/stderr with truncation and a hard timeout.
     max_bytes = max_output_chars * 4  # worst-case utf-8 expansion
+    # Never pass preexec_fn here: without it CPython (3.10+) spawns through
+    # vfork(), so the child does not duplicate the runtime's page tables.
     proc: subprocess.Popen[bytes] = subprocess.Popen(
         args,
         cwd=cwd,
-        env=os.environ.copy(),
+        # env=None inherits the runtime's environment directly; copying
+        # os.environ per call only to hand Popen an identical dict is wasted work.
+        env=None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         start_new_session=True,
@@ -85,96 +134,118 @@ def _run_command_limited(
     assert proc.stdout is not None
     assert proc.stderr is not None
 
-    sel = selectors.DefaultSelector()
-    sel.register(proc.stdout, selectors.EVENT_READ, data="stdout")
-    sel.register(proc.stderr, selectors.EVENT_READ, data="stderr")
-
-    out = bytearray()
-    err = bytearray()
-    out_trunc = False
-    err_trunc = False
+    out_fd = proc.stdout.fileno()
+    err_fd = proc.stderr.fileno()
+    # Fixed-size capture buffers filled in place through memoryview cursors:
+    # no per-read slice allocation and no incremental bytearray growth.
+    views = {
+        out_fd: memoryview(bytearray(max_bytes)),
+        err_fd: memoryview(bytearray(max_bytes)),
+    }
+    pos = {out_fd: 0, err_fd: 0}
+    discard = memoryview(bytearray(_PIPE_READ_CHUNK))
+    trunc = {out_fd: False, err_fd: False}
+    open_fds = {out_fd, err_fd}
+
+    # Edge-triggered epoll on non-blocking pipes: one wakeup per readiness
+    # edge, then read in 64 KiB chunks until EAGAIN instead of one 8 KiB
+    # read per select() round trip.
+    ep = _thread_epoll()
+    for fd in open_fds:
+        os.set_blocking(fd, False)
+        ep.register(fd, select.EPOLLIN | select.EPOLLET)
+
+    devnull: int | None = None
+    splice_ok = True
+
+    def _discard(fd: int) -> int:
+        # Surplus output is spliced into /dev/null, so its pages never reach
+        # user space. readv into a scratch buffer is the fallback.
+        nonlocal devnull, splice_ok
+        if splice_ok:
+            try:
+                if devnull is None:
+                    devnull = os.open(os.devnull, os.O_WRONLY | os.O_CLOEXEC)
+                return os.splice(fd, devnull, _PIPE_DISCARD_CHUNK, flags=os.SPLICE_F_NONBLOCK)
+            except BlockingIOError:
+                raise
+            except (AttributeError, OSError):
+                splice_ok = False
+        return os.readv(fd, [discard])
+
+    def _drain(fd: int) -> None:
+        view = views[fd]
+        while True:
+            start = pos[fd]
+            room = max_bytes - start
+            # Once the buffer is full keep draining (so the child never blocks
+            # on a full pipe) but throw the data away.
+            try:
+                if room:
+                    n = os.readv(fd, [view[start : start + min(room, _PIPE_READ_CHUNK)]])
+                else:
+                    n = _discard(fd)
+            except BlockingIOError:
+                return
+            except OSError:
+                n = 0
+            if not n:
+                with contextlib.suppress(Exception):
+                    ep.unregister(fd)
+                open_fds.discard(fd)
+                return
+            if room:
+                pos[fd] = start + n
+            else:
+                trunc[fd] = True
 
-    deadline = time.monotonic() + float(timeout_s)
-    while True:
-        # Drain pipes until EOF and process exit.
-        if proc.poll() is not None and not sel.get_map():
-            break
+    try:
+        deadline = time.monotonic() + float(timeout_s)
+        timed_out = False
+        while open_fds:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for fd, _ in ep.poll(min(0.2, remaining)):
+                _drain(fd)
+
+        if not timed_out:
+            # Pipes hit EOF; the process may still be finishing up.
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                timed_out = True
 
-        remaining = deadline - time.monotonic()
-        if remaining <= 0:
+        if timed_out:
             _kill_process_tree(proc)
             # Best-effort drain any remaining output quickly.
+            for fd in list(open_fds):
+                _drain(fd)
+    finally:
+        # The epoll instance outlives this call; leave it with no registrations.
+        for fd in open_fds:
             with contextlib.suppress(Exception):
-                while sel.get_map():
-                    for key, _ in sel.select(timeout=0):
-                        chunk = key.fileobj.read1(8192)  # type: ignore[attr-defined]
-                        if not chunk:
-                            sel.unregister(key.fileobj)
-                            with contextlib.suppress(Exception):
-                                key.fileobj.close()
-                            continue
-                        if key.data == "stdout":
-                            if len(out) < max_bytes:
-                                take = min(len(chunk), max_bytes - len(out))
-                                out.extend(chunk[:take])
-                                if take < len(chunk):
-                                    out_trunc = True
-                            else:
-                                out_trunc = True
-                        else:
-                            if len(err) < max_bytes:
-                                take = min(len(chunk), max_bytes - len(err))
-                                err.extend(chunk[:take])
-                                if take < len(chunk):
-                                    err_trunc = True
-                            else:
-                                err_trunc = True
-            stdout = _decode_output(bytes(out))
-            stderr = _decode_output(bytes(err)) or f"Command timed out after {timeout_s}s"
-            if out_trunc:
-                stdout = stdout[:max_output_chars] + "\n<output truncated>"
-            if err_trunc:
-                stderr = stderr[:max_output_chars] + "\n<output truncated>"
-            return stdout, stderr, 124
-
-        for key, _ in sel.select(timeout=min(0.2, remaining)):
-            stream = key.fileobj
-            try:
-                chunk = stream.read1(8192)  # type: ignore[attr-defined]
-            except Exception:
-                chunk = b""
-            if not chunk:
-                with contextlib.suppress(Exception):
-                    sel.unregister(stream)
-                with contextlib.suppress(Exception):
-                    stream.close()
-                continue
-
-            if key.data == "stdout":
-                if len(out) < max_bytes:
-                    take = min(len(chunk), max_bytes - len(out))
-                    out.extend(chunk[:take])
-                    if take < len(chunk):
-                        out_trunc = True
-                else:
-                    out_trunc = True
-            else:
-                if len(err) < max_bytes:
-                    take = min(len(chunk), max_bytes - len(err))
-                    err.extend(chunk[:take])
-                    if take < len(chunk):
-                        err_trunc = True
-                else:
-                    err_trunc = True
-
-    rc = int(proc.returncode or 0)
-    stdout = _decode_output(bytes(out))
-    stderr = _decode_output(bytes(err))
-    if out_trunc:
+                ep.unregister(fd)
+        for stream in (proc.stdout, proc.stderr):
+            with contextlib.suppress(Exception):
+                stream.close()
+        if devnull is not None:
+            os.close(devnull)
+
+    stdout = _decode_output(bytes(views[out_fd][: pos[out_fd]]))
+    stderr = _decode_output(bytes(views[err_fd][: pos[err_fd]]))
+    if timed_out:
+        stderr = stderr or f"Command timed out after {timeout_s}s"
+    if trunc[out_fd]:
         stdout = stdout[:max_output_chars] + "\n<output truncated>"
-    if err_trunc:
+    if trunc[err_fd]:
         stderr = stderr[:max_output_chars] + "\n<output truncated>"
-    return stdout, stderr, rc
+    return stdout, stderr, 124 if timed_out else int(proc.returncode or 0)
+
+
+def _split_cmd(command: str) -> list[str]:
+    return shlex.split(command)
 
 
 class ExecRequest(BaseModel):
@@ -196,7 +267,7 @@ class DownloadManyRequest(BaseModel):
     paths: list[str]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class _ManifestEntry:
     path: str
     kind: Literal["file", "dir", "symlink"]
@@ -206,18 +277,25 @@ class _ManifestEntry:
     link_target: str | None
 
 
-def _safe_path(rel_path: str) -> Path:
+def _safe_path_str(rel_path: str) -> str:
     p = rel_path.strip().lstrip("/")
     if not p:
         raise ValueError("empty path")
 
-    full = (APP_ROOT / p).resolve()
+    # realpath resolves symlinks in every component (missing tails are kept
+    # lexically), so a link inside /app cannot point the file API outside it.
+    root = str(APP_ROOT)
+    full = os.path.realpath(os.path.join(root, p))
     # Prevent escape from /app.
-    if APP_ROOT not in full.parents and full != APP_ROOT:
+    if full != root and not full.startswith(root + os.sep):
         raise ValueError("path escapes /app")
     return full
 
 
+def _safe_path(rel_path: str) -> Path:
+    return Path(_safe_path_str(rel_path))
+
+
 def _start_preview() -> None:
     # Start the preview server in the background. If it exits, we just log.
     env = os.environ.copy()
@@ -236,6 +314,7 @@ def _start_preview() -> None:
             except Exception:
                 logf = None
             try:
+                # No preexec_fn, so CPython spawns this via vfork() rather than fork().
                 proc = subprocess.Popen(
                     cmd,
                     cwd=str(APP_ROOT),
@@ -273,7 +352,7 @@ async def healthz() -> dict:
 @app.post("/exec", response_model=ExecResponse)
 async def exec_cmd(req: ExecRequest) -> ExecResponse:
     try:
-        args = shlex.split(req.command)
+        args = _split_cmd(req.command)
         stdout, stderr, code = await asyncio.to_thread(
             _run_command_limited,
             args=args,
@@ -294,199 +373,353 @@ async def execute_cmd(req: ExecRequest) -> ExecResponse:
     return await exec_cmd(req)
 
 
+# /list results per base dir, with the mtime of every directory walked.
+# Creating, deleting or renaming an entry bumps its parent directory's mtime, so
+# re-stat'ing those directories tells whether a cached listing is still current
+# at one stat per directory instead of a full scandir walk.
+_list_cache: dict[str, tuple[list[str], list[tuple[str, int]]]] = {}
+_LIST_CACHE_MAX = 32
+# Filesystems with coarse timestamps can change a directory twice within one
+# mtime tick. A walk that saw a directory modified this recently is not cached,
+# since a later change could leave its mtime unchanged.
+_LIST_CACHE_RACY_NS = 2_000_000_000
+
+
+def _dir_mtimes_unchanged(dir_mtimes: list[tuple[str, int]]) -> bool:
+    for d, mtime_ns in dir_mtimes:
+        try:
+            if os.stat(d).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+
 @app.get("/list")
 async def list_files(dir: str = "src") -> dict:
     try:
-        base = _safe_path(dir)
+        base = _safe_path_str(dir)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    if not base.exists() or not base.is_dir():
+    if not os.path.isdir(base):
         raise HTTPException(status_code=404, detail="dir not found")
 
     def _list_sync() -> list[str]:
+        cached = _list_cache.get(base)
+        if cached is not None and _dir_mtimes_unchanged(cached[1]):
+            return cached[0]
+
+        racy_after_ns = time.time_ns() - _LIST_CACHE_RACY_NS
         out: list[str] = []
-        for root, dirs, files in os.walk(base):
-            # Skip node_modules for performance
-            dirs[:] = [
-                d for d in dirs if d != "node_modules" and not d.startswith(".")
-            ]
-            for fn in files:
-                if fn.startswith("."):
-                    continue
-                full = Path(root) / fn
-                rel = full.relative_to(APP_ROOT)
-                out.append(str(rel))
+        dir_mtimes: list[tuple[str, int]] = []
+        # One scandir pass per directory; DirEntry type checks use d_type so
+        # plain files and dirs cost no extra stat syscalls.
+        prefix_len = len(str(APP_ROOT)) + 1
+        stack = [base]
+        while stack:
+            d = stack.pop()
+            try:
+                # Taken before scanning so a change mid-walk invalidates the entry.
+                dir_mtimes.append((d, os.stat(d).st_mtime_ns))
+                it = os.scandir(d)
+            except OSError:
+                continue
+            with it:
+                for e in it:
+                    if e.name.startswith("."):
+                        continue
+                    try:
+                        is_dir = e.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        # Skip node_modules for performance
+                        if e.name != "node_modules" and not e.is_symlink():
+                            stack.append(e.path)
+                        continue
+                    out.append(e.path[prefix_len:])
 
         out.sort()
+        if all(mtime_ns < racy_after_ns for _, mtime_ns in dir_mtimes):
+            if len(_list_cache) >= _LIST_CACHE_MAX:
+                _list_cache.clear()
+            _list_cache[base] = (out, dir_mtimes)
+        else:
+            _list_cache.pop(base, None)
         return out
 
-    return {"files": await asyncio.to_thread(_list_sync)}
+    return {"files": await _run_in_pool(_io_pool, _list_sync)}
 
 
 @app.get("/download/{file_path:path}")
 async def download(file_path: str):
     try:
-        full = _safe_path(file_path)
+        full = _safe_path_str(file_path)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    if not full.exists() or not full.is_file():
+    if not os.path.isfile(full):
         raise HTTPException(status_code=404, detail="file not found")
 
-    payload = await asyncio.to_thread(full.read_bytes)
-    return Response(content=payload, media_type="application/octet-stream")
+    # FileResponse streams via sendfile(2) where available instead of buffering
+    # the whole file in the worker.
+    return FileResponse(full, media_type="application/octet-stream")
 
 
-@app.post("/download_many")
-async def download_many(req: DownloadManyRequest) -> dict:
-    def _download_many_sync() -> dict:
-        files: list[dict] = []
-        paths = req.paths if isinstance(req.paths, list) else []
-        for raw in paths:
-            p = str(raw or "")
-            try:
-                full = _safe_path(p)
-            except ValueError:
-                files.append({"path": p, "content_b64": None, "error": "invalid_path"})
-                continue
+# Multiple of 3 so each base64-encoded chunk is padding-free and the chunks can
+# be concatenated into a single valid base64 string.
+_DOWNLOAD_B64_CHUNK = 3 * 21 * 1024
+# Files up to this size are read and encoded whole by the prefetch pool; bigger
+# ones are streamed chunk by chunk so peak memory stays bounded.
+_DOWNLOAD_INLINE_MAX = 1024 * 1024
+_DOWNLOAD_PREFETCH = 8
+_download_pool = ThreadPoolExecutor(
+    max_workers=_DOWNLOAD_PREFETCH, thread_name_prefix="download"
+)
 
-            if not full.exists():
-                files.append({"path": p, "content_b64": None, "error": "file_not_found"})
-                continue
-            if full.is_dir():
-                files.append({"path": p, "content_b64": None, "error": "is_directory"})
-                continue
-            try:
-                payload = full.read_bytes()
-            except PermissionError:
-                files.append({"path": p, "content_b64": None, "error": "permission_denied"})
-                continue
 
-            files.append(
-                {
-                    "path": p,
-                    "content_b64": base64.b64encode(payload).decode("ascii"),
-                    "error": None,
-                }
-            )
+def _download_error(exc: OSError) -> str:
+    if isinstance(exc, PermissionError):
+        return "permission_denied"
+    if isinstance(exc, IsADirectoryError):
+        return "is_directory"
+    return "file_not_found"
 
-        return {"files": files}
 
-    return await asyncio.to_thread(_download_many_sync)
-
-
-def _walk_manifest(base: Path, *, include_hidden: bool) -> list[_ManifestEntry]:
-    out: list[_ManifestEntry] = []
+def _download_prefetch(p: str) -> tuple[str | None, bytes | None, str | None]:
+    # Returns (full_path, content_b64, error). content_b64 is None without an
+    # error when the file is too large to inline and must be streamed.
+    try:
+        full = _safe_path_str(p)
+    except ValueError:
+        return None, None, "invalid_path"
+    try:
+        with open(full, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size > _DOWNLOAD_INLINE_MAX:
+                return full, None, None
+            payload = fh.read()
+    except OSError as exc:
+        return None, None, _download_error(exc)
+    return full, binascii.b2a_base64(payload, newline=False), None
 
-    def _is_hidden(rel_parts: tuple[str, ...]) -> bool:
-        return any(part.startswith(".") for part in rel_parts if part)
 
-    # Safety/perf: never export .git, and avoid traversing node_modules which can be enormous.
-    prune_dirs = {".git", "node_modules"}
+def _iter_file_b64(head: bytes, full: str) -> Iterator[bytes]:
+    with contextlib.ExitStack() as stack:
+        try:
+            fh = stack.enter_context(open(full, "rb"))
+        except OSError as exc:
+            yield head + b',"content_b64":null,"error":"' + _download_error(exc).encode() + b'"}'
+            return
 
-    for root, dirs, files in os.walk(base, followlinks=False):
+        error = b"null"
+        yield head + b',"content_b64":"'
         try:
-            root_path = Path(root)
-            rel_root = root_path.relative_to(APP_ROOT)
-        except Exception:
-            continue
+            while chunk := fh.read(_DOWNLOAD_B64_CHUNK):
+                yield binascii.b2a_base64(chunk, newline=False)
+        except OSError as exc:
+            error = b'"' + _download_error(exc).encode() + b'"'
+    yield b'","error":' + error + b"}"
+
+
+def _download_many_iter(paths: list[str]) -> Iterator[bytes]:
+    # Hand-written JSON stream: {"files":[{"path":..,"content_b64":..,"error":..},..]}
+    # A small window of files is read concurrently ahead of the one being
+    # emitted so page-cache misses overlap instead of serialising.
+    pending = deque(
+        _download_pool.submit(_download_prefetch, p)
+        for p in paths[:_DOWNLOAD_PREFETCH]
+    )
+    next_idx = len(pending)
+    try:
+        yield b'{"files":['
+        for i, p in enumerate(paths):
+            full, content, error = pending.popleft().result()
+            if next_idx < len(paths):
+                pending.append(_download_pool.submit(_download_prefetch, paths[next_idx]))
+                next_idx += 1
+
+            head = (b"," if i else b"") + b'{"path":' + json.dumps(p).encode("utf-8")
+            if error is not None:
+                yield head + b',"content_b64":null,"error":"' + error.encode() + b'"}'
+            elif content is not None:
+                # Yield the encoded payload as-is: gluing it to the JSON framing
+                # would copy up to ~1.3 MiB again just to build one chunk.
+                yield head + b',"content_b64":"'
+                yield content
+                yield b'","error":null}'
+            else:
+                assert full is not None
+                yield from _iter_file_b64(head, full)
+        yield b"]}"
+    finally:
+        # Client went away mid-stream: don't keep reading files nobody wants.
+        for fut in pending:
+            fut.cancel()
 
-        # Prune selected dirs early.
-        dirs[:] = [d for d in dirs if d not in prune_dirs]
 
-        if not include_hidden:
-            # If any component of the directory is hidden, skip its contents.
-            if _is_hidden(rel_root.parts):
-                dirs[:] = []
-                continue
-            dirs[:] = [d for d in dirs if not d.startswith(".")]
-            files = [f for f in files if not f.startswith(".")]
+@app.post("/download_many")
+async def download_many(req: DownloadManyRequest):
+    paths = [str(raw or "") for raw in req.paths] if isinstance(req.paths, list) else []
+    # A sync iterator is driven from Starlette's threadpool, so file reads do not
+    # block the event loop.
+    return StreamingResponse(
+        _download_many_iter(paths), media_type="application/json"
+    )
 
-        for d in dirs:
-            full = root_path / d
-            rel = full.relative_to(APP_ROOT)
-            try:
-                st = full.lstat()
-            except Exception:
-                continue
-            out.append(
-                _ManifestEntry(
-                    path=str(rel),
-                    kind="dir",
-                    size=None,
-                    mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
-                    mode=int(st.st_mode) & 0o777,
-                    link_target=None,
-                )
-            )
 
-        for f in files:
-            full = root_path / f
-            rel = full.relative_to(APP_ROOT)
-            try:
-                st = full.lstat()
-            except Exception:
-                continue
+# Safety/perf: never export .git, and avoid traversing node_modules which can be enormous.
+_MANIFEST_PRUNE_DIRS = frozenset({".git", "node_modules"})
+# Walks are syscall-bound (scandir/lstat release the GIL), so top-level subtrees
+# are scanned concurrently.
+_manifest_pool = ThreadPoolExecutor(thread_name_prefix="manifest")
+_manifest_path_key = operator.attrgetter("path")
+
 
-            if full.is_symlink():
+def _scan_manifest(
+    stack: list[str], *, include_hidden: bool, spill: list[str] | None = None
+) -> list[_ManifestEntry]:
+    # Explicit stack + scandir: each entry costs a single lstat (DirEntry.stat
+    # caches it) instead of the lstat/is_symlink/is_file triple of os.walk.
+    # With `spill`, subdirectories are handed back to the caller instead of
+    # being descended into. Returns entries sorted by path.
+    out: list[_ManifestEntry] = []
+    prefix_len = len(str(APP_ROOT)) + 1
+    descend = stack if spill is None else spill
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                name = e.name
+                if not include_hidden and name.startswith("."):
+                    continue
                 try:
-                    target = os.readlink(full)
-                except Exception:
-                    target = ""
-                out.append(
-                    _ManifestEntry(
-                        path=str(rel),
-                        kind="symlink",
-                        size=None,
-                        mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
-                        mode=int(st.st_mode) & 0o777,
-                        link_target=target,
+                    st = e.stat(follow_symlinks=False)
+                    # Matches os.walk: a symlink to a directory is listed as a
+                    # dir but never descended into.
+                    is_dir = e.is_dir()
+                except OSError:
+                    continue
+
+                rel = e.path[prefix_len:]
+                mode = st.st_mode
+                if is_dir:
+                    if name in _MANIFEST_PRUNE_DIRS:
+                        continue
+                    out.append(
+                        _ManifestEntry(
+                            path=rel,
+                            kind="dir",
+                            size=None,
+                            mtime_ns=st.st_mtime_ns,
+                            mode=mode & 0o777,
+                            link_target=None,
+                        )
                     )
-                )
-                continue
+                    if not stat.S_ISLNK(mode):
+                        descend.append(e.path)
+                    continue
 
-            if full.is_file():
-                out.append(
-                    _ManifestEntry(
-                        path=str(rel),
-                        kind="file",
-                        size=int(st.st_size),
-                        mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
-                        mode=int(st.st_mode) & 0o777,
-                        link_target=None,
+                if stat.S_ISLNK(mode):
+                    try:
+                        target = os.readlink(e.path)
+                    except OSError:
+                        target = ""
+                    out.append(
+                        _ManifestEntry(
+                            path=rel,
+                            kind="symlink",
+                            size=None,
+                            mtime_ns=st.st_mtime_ns,
+                            mode=mode & 0o777,
+                            link_target=target,
+                        )
+                    )
+                    continue
+
+                if stat.S_ISREG(mode):
+                    out.append(
+                        _ManifestEntry(
+                            path=rel,
+                            kind="file",
+                            size=st.st_size,
+                            mtime_ns=st.st_mtime_ns,
+                            mode=mode & 0o777,
+                            link_target=None,
+                        )
                     )
-                )
 
-    out.sort(key=lambda e: e.path)
+    out.sort(key=_manifest_path_key)
     return out
 
 
+def _walk_manifest(base: str, *, include_hidden: bool) -> list[_ManifestEntry]:
+    if not include_hidden:
+        # If any component of the base directory is hidden, there is nothing to export.
+        rel_base = base[len(str(APP_ROOT)) + 1 :]
+        if any(part.startswith(".") for part in rel_base.split(os.sep) if part):
+            return []
+
+    subdirs: list[str] = []
+    top = _scan_manifest([base], include_hidden=include_hidden, spill=subdirs)
+    if not subdirs:
+        return top
+    futures = [
+        _manifest_pool.submit(_scan_manifest, [d], include_hidden=include_hidden)
+        for d in subdirs
+    ]
+    # Every partial result is already sorted; merging is O(N log K) rather than
+    # re-sorting all N entries.
+    return list(
+        heapq.merge(top, *(f.result() for f in futures), key=_manifest_path_key)
+    )
+
+
 @app.get("/manifest")
-async def manifest(dir: str = ".", include_hidden: int = 1) -> dict:
+async def manifest(dir: str = ".", include_hidden: int = 1) -> Response:
     try:
-        base = _safe_path(dir or ".")
+        base = _safe_path_str(dir or ".")
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    if not base.exists() or not base.is_dir():
+    if not os.path.isdir(base):
         raise HTTPException(status_code=404, detail="dir not found")
 
-    entries = await asyncio.to_thread(
-        _walk_manifest, base, include_hidden=bool(int(include_hidden or 0))
+    entries = await _run_in_pool(
+        _io_pool, _walk_manifest, base, include_hidden=bool(int(include_hidden or 0))
     )
-    payload = [
-        {
-            "path": e.path,
-            "kind": e.kind,
-            "size": e.size,
-            "mtime_ns": e.mtime_ns,
-            "mode": e.mode,
-            "link_target": e.link_target,
-        }
-        for e in entries
-    ]
-    return {"entries": payload}
+    # orjson serialises the dataclasses directly (fields in declaration order),
+    # skipping the per-entry dict and FastAPI's jsonable_encoder pass.
+    return Response(
+        content=orjson.dumps({"entries": entries}), media_type="application/json"
+    )
+
+
+def _decode_b64(content_b64: str) -> bytes:
+    # strict_mode validates while decoding, in one pass; b64decode(validate=True)
+    # regex-scans the whole input first. Also rejects trailing data after padding.
+    # Raises ValueError (binascii.Error, or non-ASCII input).
+    return binascii.a2b_base64(content_b64, strict_mode=True)
+
+
+def _write_file_bytes(full: Path, payload: bytes) -> None:
+    # Raw fd writes skip the buffered file object (and its extra copy for large
+    # payloads); the parent directory is only created when the open says so.
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC
+    try:
+        fd = os.open(full, flags, 0o666)
+    except FileNotFoundError:
+        full.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(full, flags, 0o666)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
 
 
 @app.post("/write_b64")
@@ -497,13 +730,12 @@ async def write_b64(req: WriteB64Request) -> dict:
         raise HTTPException(status_code=400, detail=str(exc))
 
     try:
-        payload = base64.b64decode(req.content_b64.encode("ascii"), validate=True)
-    except Exception:
+        payload = _decode_b64(req.content_b64)
+    except ValueError:
         raise HTTPException(status_code=400, detail="invalid base64")
 
     def _write_sync() -> None:
-        full.parent.mkdir(parents=True, exist_ok=True)
-        full.write_bytes(payload)
+        _write_file_bytes(full, payload)
 
-    await asyncio.to_thread(_write_sync)
+    await _run_in_pool(_cpu_pool, _write_sync)
     return {"ok": True, "path": str(req.path)}
@@ -4,27 +4,27 @@ from __future__ import annotations
 import re
 from pathlib import Path
 
+# Problematic IPv6/hardcoded HMR host config from the upstream template.
+_SERVER_BLOCK_RE = re.compile(r"server:\s*\{.*?\}\s*\n\s*\}\s*\);\s*$", re.DOTALL)
+
+_SERVER_BLOCK = (
+    "server: {\n"
+    '    host: "0.0.0.0",\n'
+    "    port: 3000,\n"
+    "    strictPort: true,\n"
+    "    hmr: {\n"
+    '      protocol: "wss",\n'
+    "      clientPort: 443,\n"
+    "    },\n"
+    "  }\n"
+    "});\n"
+)
+
 p = Path("/app/vite.config.ts")
 text = p.read_text(encoding="utf-8")
 
-# Replace a problematic IPv6/hardcoded HMR host config from the upstream template.
-text2 = re.sub(
-    r"server:\s*\{[\s\S]*?\}\s*\n\s*\}\s*\);\s*$",
-    (
-        "server: {\n"
-        '    host: "0.0.0.0",\n'
-        "    port: 3000,\n"
-        "    strictPort: true,\n"
-        "    hmr: {\n"
-        '      protocol: "wss",\n'
-        "      clientPort: 443,\n"
-        "    },\n"
-        "  }\n"
-        "});\n"
-    ),
-    text,
-    count=1,
-)
+m = _SERVER_BLOCK_RE.search(text)
+text2 = text if m is None else text[: m.start()] + _SERVER_BLOCK + text[m.end() :]
 
 # Fallback: if the expected shape changed, do a smaller targeted rewrite.
 if text2 == text:
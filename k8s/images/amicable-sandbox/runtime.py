@@ -1,30 +1,42 @@
 from __future__ import annotations
 
 import asyncio
-import base64
+import binascii
 import contextlib
+import functools
+import operator
 import os
-import selectors
+import select
 import shlex
 import signal
+import stat
 import subprocess
+import tempfile
 import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Literal
+from typing import TYPE_CHECKING
 
+import orjson
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
 
 APP_ROOT = Path("/app")
 
 app = FastAPI(title="Amicable Sandbox Runtime", version="1.0.0")
 
 
-@dataclass
+# Immutable: writers swap in a new instance under the lock, while the
+# /healthz and /readyz probes read the current reference without locking.
+@dataclass(frozen=True)
 class _PreviewSupervisorState:
     running_pid: int | None = None
     restart_count: int = 0
@@ -36,8 +48,13 @@ class _PreviewSupervisorState:
 
 _preview_state = _PreviewSupervisorState()
 _preview_state_lock = threading.Lock()
+# (state, snapshot dict) for the last state the probes saw. Because states are
+# immutable, identity tells whether the cached dict is still current.
+_preview_snapshot_cache: tuple[_PreviewSupervisorState, dict] | None = None
 
 
+# Env vars are fixed for the lifetime of the container; parse each one once.
+@functools.cache
 def _env_int(name: str, default: int) -> int:
     raw = (os.environ.get(name) or "").strip()
     if not raw:
@@ -57,29 +74,42 @@ def _exec_max_output_chars() -> int:
     return max(10_000, _env_int("SANDBOX_EXEC_MAX_OUTPUT_CHARS", 200_000))
 
 
+def _exec_max_command_chars() -> int:
+    # Optional bound on the size of a single /exec command; 0 (default) = off.
+    return max(0, _env_int("SANDBOX_EXEC_MAX_COMMAND_CHARS", 0))
+
+
 def _preview_max_restarts() -> int:
     return max(1, _env_int("AMICABLE_PREVIEW_MAX_RESTARTS", 100))
 
 
 def _preview_state_update(**kwargs) -> None:
+    global _preview_state
     with _preview_state_lock:
-        for key, value in kwargs.items():
-            setattr(_preview_state, key, value)
+        _preview_state = replace(_preview_state, **kwargs)
 
 
 def _preview_state_snapshot() -> dict:
-    with _preview_state_lock:
-        running = _preview_state.running_pid is not None and not _preview_state.exhausted
-        return {
-            "running": running,
-            "running_pid": _preview_state.running_pid,
-            "restart_count": _preview_state.restart_count,
-            "max_restarts": _preview_max_restarts(),
-            "exhausted": _preview_state.exhausted,
-            "last_exit_code": _preview_state.last_exit_code,
-            "last_exit_ts_ms": _preview_state.last_exit_ts_ms,
-            "last_error": _preview_state.last_error,
-        }
+    # Probes hit this every few seconds while the state changes only on a
+    # preview restart, so the dict is built once per state and shared.
+    # Callers must not mutate it.
+    global _preview_snapshot_cache
+    state = _preview_state
+    cached = _preview_snapshot_cache
+    if cached is not None and cached[0] is state:
+        return cached[1]
+    snapshot = {
+        "running": state.running_pid is not None and not state.exhausted,
+        "running_pid": state.running_pid,
+        "restart_count": state.restart_count,
+        "max_restarts": _preview_max_restarts(),
+        "exhausted": state.exhausted,
+        "last_exit_code": state.last_exit_code,
+        "last_exit_ts_ms": state.last_exit_ts_ms,
+        "last_error": state.last_error,
+    }
+    _preview_snapshot_cache = (state, snapshot)
+    return snapshot
 
 
 def _decode_output(b: bytes) -> str:
@@ -108,15 +138,53 @@ def _kill_process_tree(proc: subprocess.Popen[bytes]) -> None:
             proc.kill()
 
 
+# Filesystem endpoints run on fixed, named pools instead of asyncio's default
+# executor; base64 decoding holds the GIL, so it gets one worker per core.
+# /exec stays on the default executor: a long-running command must not pin a
+# worker that /list or /manifest need.
+_CPU_COUNT = os.cpu_count() or 1
+_io_pool = ThreadPoolExecutor(
+    max_workers=max(8, _CPU_COUNT * 4), thread_name_prefix="sandbox-io"
+)
+_cpu_pool = ThreadPoolExecutor(max_workers=_CPU_COUNT, thread_name_prefix="sandbox-cpu")
+
+
+async def _run_in_pool(pool: ThreadPoolExecutor, fn, /, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+
+# Bytes requested per read(2); matches the default Linux pipe buffer.
+_PIPE_READ_CHUNK = 64 * 1024
+# Upper bound per splice() of surplus output; the pipe itself holds far less.
+_PIPE_DISCARD_CHUNK = 1024 * 1024
+
+_epoll_local = threading.local()
+
+
+def _thread_epoll() -> select.epoll:
+    # /exec runs on reused to_thread workers: keep one epoll instance per worker
+    # instead of an epoll_create/close pair per command. Per thread, not global,
+    # so concurrent commands never receive each other's events.
+    ep = getattr(_epoll_local, "ep", None)
+    if ep is None or ep.closed:
+        ep = _epoll_local.ep = select.epoll()
+    return ep
+
+
 def _run_command_limited(
     *, args: list[str], cwd: str, timeout_s: int, max_output_chars: int
 ) -> tuple[str, str, int]:
     # Run without shell; capture stdout/stderr with truncation and a hard timeout.
     max_bytes = max_output_chars * 4  # worst-case utf-8 expansion
+    # Never pass preexec_fn here: without it CPython (3.10+) spawns through
+    # vfork(), so the child does not duplicate the runtime's page tables.
     proc: subprocess.Popen[bytes] = subprocess.Popen(
         args,
         cwd=cwd,
-        env=os.environ.copy(),
+        # env=None inherits the runtime's environment directly; copying
+        # os.environ per call only to hand Popen an identical dict is wasted work.
+        env=None,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         start_new_session=True,
@@ -124,96 +192,121 @@ def _run_command_limited(
     assert proc.stdout is not None
     assert proc.stderr is not None
 
-    sel = selectors.DefaultSelector()
-    sel.register(proc.stdout, selectors.EVENT_READ, data="stdout")
-    sel.register(proc.stderr, selectors.EVENT_READ, data="stderr")
-
-    out = bytearray()
-    err = bytearray()
-    out_trunc = False
-    err_trunc = False
+    out_fd = proc.stdout.fileno()
+    err_fd = proc.stderr.fileno()
+    # Fixed-size capture buffers filled in place through memoryview cursors:
+    # no per-read slice allocation and no incremental bytearray growth.
+    views = {
+        out_fd: memoryview(bytearray(max_bytes)),
+        err_fd: memoryview(bytearray(max_bytes)),
+    }
+    pos = {out_fd: 0, err_fd: 0}
+    discard = memoryview(bytearray(_PIPE_READ_CHUNK))
+    trunc = {out_fd: False, err_fd: False}
+    open_fds = {out_fd, err_fd}
+
+    # Edge-triggered epoll on non-blocking pipes: one wakeup per readiness
+    # edge, then read in 64 KiB chunks until EAGAIN instead of one 8 KiB
+    # read per select() round trip.
+    ep = _thread_epoll()
+    for fd in open_fds:
+        os.set_blocking(fd, False)
+        ep.register(fd, select.EPOLLIN | select.EPOLLET)
+
+    devnull: int | None = None
+    splice_ok = True
+
+    def _discard(fd: int) -> int:
+        # Surplus output is spliced into /dev/null, so its pages never reach
+        # user space. readv into a scratch buffer is the fallback.
+        nonlocal devnull, splice_ok
+        if splice_ok:
+            try:
+                if devnull is None:
+                    devnull = os.open(os.devnull, os.O_WRONLY | os.O_CLOEXEC)
+                return os.splice(fd, devnull, _PIPE_DISCARD_CHUNK, flags=os.SPLICE_F_NONBLOCK)
+            except BlockingIOError:
+                raise
+            except (AttributeError, OSError):
+                splice_ok = False
+        return os.readv(fd, [discard])
+
+    def _drain(fd: int) -> None:
+        view = views[fd]
+        while True:
+            start = pos[fd]
+            room = max_bytes - start
+            # Once the buffer is full keep draining (so the child never blocks
+            # on a full pipe) but throw the data away.
+            try:
+                if room:
+                    n = os.readv(fd, [view[start : start + min(room, _PIPE_READ_CHUNK)]])
+                else:
+                    n = _discard(fd)
+            except BlockingIOError:
+                return
+            except OSError:
+                n = 0
+            if not n:
+                with contextlib.suppress(Exception):
+                    ep.unregister(fd)
+                open_fds.discard(fd)
+                return
+            if room:
+                pos[fd] = start + n
+            else:
+                trunc[fd] = True
 
-    deadline = time.monotonic() + float(timeout_s)
-    while True:
-        # Drain pipes until EOF and process exit.
-        if proc.poll() is not None and not sel.get_map():
-            break
+    try:
+        deadline = time.monotonic() + float(timeout_s)
+        timed_out = False
+        while open_fds:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            for fd, _ in ep.poll(min(0.2, remaining)):
+                _drain(fd)
+
+        if not timed_out:
+            # Pipes hit EOF; the process may still be finishing up.
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                timed_out = True
 
-        remaining = deadline - time.monotonic()
-        if remaining <= 0:
+        if timed_out:
             _kill_process_tree(proc)
             # Best-effort drain any remaining output quickly.
+            for fd in list(open_fds):
+                _drain(fd)
+    finally:
+        # The epoll instance outlives this call; leave it with no registrations.
+        for fd in open_fds:
             with contextlib.suppress(Exception):
-                while sel.get_map():
-                    for key, _ in sel.select(timeout=0):
-                        chunk = key.fileobj.read1(8192)  # type: ignore[attr-defined]
-                        if not chunk:
-                            sel.unregister(key.fileobj)
-                            with contextlib.suppress(Exception):
-                                key.fileobj.close()
-                            continue
-                        if key.data == "stdout":
-                            if len(out) < max_bytes:
-                                take = min(len(chunk), max_bytes - len(out))
-                                out.extend(chunk[:take])
-                                if take < len(chunk):
-                                    out_trunc = True
-                            else:
-                                out_trunc = True
-                        else:
-                            if len(err) < max_bytes:
-                                take = min(len(chunk), max_bytes - len(err))
-                                err.extend(chunk[:take])
-                                if take < len(chunk):
-                                    err_trunc = True
-                            else:
-                                err_trunc = True
-            stdout = _decode_output(bytes(out))
-            stderr = _decode_output(bytes(err)) or f"Command timed out after {timeout_s}s"
-            if out_trunc:
-                stdout = stdout[:max_output_chars] + "\n<output truncated>"
-            if err_trunc:
-                stderr = stderr[:max_output_chars] + "\n<output truncated>"
-            return stdout, stderr, 124
-
-        for key, _ in sel.select(timeout=min(0.2, remaining)):
-            stream = key.fileobj
-            try:
-                chunk = stream.read1(8192)  # type: ignore[attr-defined]
-            except Exception:
-                chunk = b""
-            if not chunk:
-                with contextlib.suppress(Exception):
-                    sel.unregister(stream)
-                with contextlib.suppress(Exception):
-                    stream.close()
-                continue
-
-            if key.data == "stdout":
-                if len(out) < max_bytes:
-                    take = min(len(chunk), max_bytes - len(out))
-                    out.extend(chunk[:take])
-                    if take < len(chunk):
-                        out_trunc = True
-                else:
-                    out_trunc = True
-            else:
-                if len(err) < max_bytes:
-                    take = min(len(chunk), max_bytes - len(err))
-                    err.extend(chunk[:take])
-                    if take < len(chunk):
-                        err_trunc = True
-                else:
-                    err_trunc = True
-
-    rc = int(proc.returncode or 0)
-    stdout = _decode_output(bytes(out))
-    stderr = _decode_output(bytes(err))
-    if out_trunc:
+                ep.unregister(fd)
+        for stream in (proc.stdout, proc.stderr):
+            with contextlib.suppress(Exception):
+                stream.close()
+        if devnull is not None:
+            os.close(devnull)
+
+    stdout = _decode_output(bytes(views[out_fd][: pos[out_fd]]))
+    stderr = _decode_output(bytes(views[err_fd][: pos[err_fd]]))
+    if timed_out:
+        stderr = stderr or f"Command timed out after {timeout_s}s"
+    if trunc[out_fd]:
         stdout = stdout[:max_output_chars] + "\n<output truncated>"
-    if err_trunc:
+    if trunc[err_fd]:
         stderr = stderr[:max_output_chars] + "\n<output truncated>"
-    return stdout, stderr, rc
+    return stdout, stderr, 124 if timed_out else int(proc.returncode or 0)
+
+
+def _split_cmd(command: str) -> list[str]:
+    max_chars = _exec_max_command_chars()
+    if max_chars and len(command) > max_chars:
+        raise ValueError("command too long")
+    return shlex.split(command)
 
 
 class ExecRequest(BaseModel):
@@ -235,28 +328,25 @@ class DownloadManyRequest(BaseModel):
     paths: list[str]
 
 
-@dataclass(frozen=True)
-class _ManifestEntry:
-    path: str
-    kind: Literal["file", "dir", "symlink"]
-    size: int | None
-    mtime_ns: int
-    mode: int
-    link_target: str | None
-
-
-def _safe_path(rel_path: str) -> Path:
+def _safe_path_str(rel_path: str) -> str:
     p = rel_path.strip().lstrip("/")
     if not p:
         raise ValueError("empty path")
 
-    full = (APP_ROOT / p).resolve()
+    # realpath resolves symlinks in every component (missing tails are kept
+    # lexically), so a link inside /app cannot point the file API outside it.
+    root = str(APP_ROOT)
+    full = os.path.realpath(os.path.join(root, p))
     # Prevent escape from /app.
-    if APP_ROOT not in full.parents and full != APP_ROOT:
+    if full != root and not full.startswith(root + os.sep):
         raise ValueError("path escapes /app")
     return full
 
 
+def _safe_path(rel_path: str) -> Path:
+    return Path(_safe_path_str(rel_path))
+
+
 def _start_preview() -> None:
     # Start the preview server in the background with auto-respawn.
     env = os.environ.copy()
@@ -350,7 +440,7 @@ async def readyz(response: Response) -> dict:
 @app.post("/exec", response_model=ExecResponse)
 async def exec_cmd(req: ExecRequest) -> ExecResponse:
     try:
-        args = shlex.split(req.command)
+        args = _split_cmd(req.command)
         stdout, stderr, code = await asyncio.to_thread(
             _run_command_limited,
             args=args,
@@ -383,22 +473,35 @@ async def list_files(dir: str = "src") -> dict:
 
     def _list_sync() -> list[str]:
         out: list[str] = []
-        for root, dirs, files in os.walk(base):
-            # Skip node_modules for performance
-            dirs[:] = [
-                d for d in dirs if d != "node_modules" and not d.startswith(".")
-            ]
-            for fn in files:
-                if fn.startswith("."):
-                    continue
-                full = Path(root) / fn
-                rel = full.relative_to(APP_ROOT)
-                out.append(str(rel))
+        # One scandir pass per directory. Names are filtered before anything
+        # else is built, and DirEntry type checks use d_type, so pruned and
+        # plain entries cost no stat syscall or Path object.
+        prefix_len = len(str(APP_ROOT)) + 1
+        stack = [str(base)]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for e in it:
+                    if e.name.startswith("."):
+                        continue
+                    try:
+                        is_dir = e.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        # Skip node_modules for performance
+                        if e.name != "node_modules" and not e.is_symlink():
+                            stack.append(e.path)
+                        continue
+                    out.append(e.path[prefix_len:])
 
         out.sort()
         return out
 
-    return {"files": await asyncio.to_thread(_list_sync)}
+    return {"files": await _run_in_pool(_io_pool, _list_sync)}
 
 
 @app.get("/download/{file_path:path}")
@@ -411,136 +514,211 @@ async def download(file_path: str):
     if not full.exists() or not full.is_file():
         raise HTTPException(status_code=404, detail="file not found")
 
-    payload = await asyncio.to_thread(full.read_bytes)
-    return Response(content=payload, media_type="application/octet-stream")
+    # FileResponse streams via sendfile(2) where available instead of buffering
+    # the whole file in the worker.
+    return FileResponse(str(full), media_type="application/octet-stream")
 
 
-@app.post("/download_many")
-async def download_many(req: DownloadManyRequest) -> dict:
-    def _download_many_sync() -> dict:
-        files: list[dict] = []
-        paths = req.paths if isinstance(req.paths, list) else []
-        for raw in paths:
-            p = str(raw or "")
-            try:
-                full = _safe_path(p)
-            except ValueError:
-                files.append({"path": p, "content_b64": None, "error": "invalid_path"})
-                continue
+# Multiple of 3 so each base64-encoded chunk is padding-free and the chunks can
+# be concatenated into a single valid base64 string.
+_DOWNLOAD_B64_CHUNK = 3 * 21 * 1024
+# Files up to this size are read and encoded whole by the prefetch pool; bigger
+# ones are streamed chunk by chunk so peak memory stays bounded.
+_DOWNLOAD_INLINE_MAX = 1024 * 1024
+_DOWNLOAD_PREFETCH = 8
+_download_pool = ThreadPoolExecutor(
+    max_workers=_DOWNLOAD_PREFETCH, thread_name_prefix="download"
+)
 
-            if not full.exists():
-                files.append({"path": p, "content_b64": None, "error": "file_not_found"})
-                continue
-            if full.is_dir():
-                files.append({"path": p, "content_b64": None, "error": "is_directory"})
-                continue
-            try:
-                payload = full.read_bytes()
-            except PermissionError:
-                files.append({"path": p, "content_b64": None, "error": "permission_denied"})
-                continue
 
-            files.append(
-                {
-                    "path": p,
-                    "content_b64": base64.b64encode(payload).decode("ascii"),
-                    "error": None,
-                }
-            )
+def _download_error(exc: OSError) -> str:
+    if isinstance(exc, PermissionError):
+        return "permission_denied"
+    if isinstance(exc, IsADirectoryError):
+        return "is_directory"
+    return "file_not_found"
 
-        return {"files": files}
 
-    return await asyncio.to_thread(_download_many_sync)
+def _download_prefetch(p: str) -> tuple[Path | None, bytes | None, str | None]:
+    # Returns (full_path, content_b64, error). content_b64 is None without an
+    # error when the file is too large to inline and must be streamed.
+    try:
+        full = _safe_path(p)
+    except ValueError:
+        return None, None, "invalid_path"
+    try:
+        with open(full, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size > _DOWNLOAD_INLINE_MAX:
+                return full, None, None
+            payload = fh.read()
+    except OSError as exc:
+        return None, None, _download_error(exc)
+    return full, binascii.b2a_base64(payload, newline=False), None
 
 
-def _walk_manifest(base: Path, *, include_hidden: bool) -> list[_ManifestEntry]:
-    out: list[_ManifestEntry] = []
+def _iter_file_b64(head: bytes, full: Path) -> Iterator[bytes]:
+    with contextlib.ExitStack() as stack:
+        try:
+            fh = stack.enter_context(open(full, "rb"))
+        except OSError as exc:
+            yield head + b',"content_b64":null,"error":"' + _download_error(exc).encode() + b'"}'
+            return
+
+        error = b"null"
+        # One reusable read buffer: each chunk then costs a single allocation, the
+        # encoded bytes that are yielded, instead of a raw bytes object as well.
+        # BufferedReader.readinto fills the buffer fully until EOF, so padding can
+        # only appear in the last chunk.
+        buf = bytearray(_DOWNLOAD_B64_CHUNK)
+        view = memoryview(buf)
+        yield head + b',"content_b64":"'
+        try:
+            while n := fh.readinto(buf):
+                yield binascii.b2a_base64(view[:n], newline=False)
+        except OSError as exc:
+            error = b'"' + _download_error(exc).encode() + b'"'
+    yield b'","error":' + error + b"}"
+
+
+def _download_many_iter(paths: list[str]) -> Iterator[bytes]:
+    # Hand-written JSON stream: {"files":[{"path":..,"content_b64":..,"error":..},..]}
+    # A small window of files is read concurrently ahead of the one being
+    # emitted so page-cache misses overlap instead of serialising.
+    pending = deque(
+        _download_pool.submit(_download_prefetch, p)
+        for p in paths[:_DOWNLOAD_PREFETCH]
+    )
+    next_idx = len(pending)
+    try:
+        yield b'{"files":['
+        for i, p in enumerate(paths):
+            full, content, error = pending.popleft().result()
+            if next_idx < len(paths):
+                pending.append(_download_pool.submit(_download_prefetch, paths[next_idx]))
+                next_idx += 1
+
+            head = (b"," if i else b"") + b'{"path":' + orjson.dumps(p)
+            if error is not None:
+                yield head + b',"content_b64":null,"error":"' + error.encode() + b'"}'
+            elif content is not None:
+                # Yield the encoded payload as-is: gluing it to the JSON framing
+                # would copy up to ~1.3 MiB again just to build one chunk.
+                yield head + b',"content_b64":"'
+                yield content
+                yield b'","error":null}'
+            else:
+                assert full is not None
+                yield from _iter_file_b64(head, full)
+        yield b"]}"
+    finally:
+        # Client went away mid-stream: don't keep reading files nobody wants.
+        for fut in pending:
+            fut.cancel()
+
+
+@app.post("/download_many")
+async def download_many(req: DownloadManyRequest):
+    paths = [str(raw or "") for raw in req.paths] if isinstance(req.paths, list) else []
+    # A sync iterator is driven from Starlette's threadpool, so file reads do not
+    # block the event loop.
+    return StreamingResponse(
+        _download_many_iter(paths), media_type="application/json"
+    )
 
-    def _is_hidden(rel_parts: tuple[str, ...]) -> bool:
-        return any(part.startswith(".") for part in rel_parts if part)
+
+def _walk_manifest(base: Path, *, include_hidden: bool) -> list[dict]:
+    # Entries are built directly in their wire shape: one dict per entry, with
+    # no intermediate record object or second copy in the handler.
+    out: list[dict] = []
+    prefix_len = len(str(APP_ROOT)) + 1
 
     # Safety/perf: never export .git, and avoid traversing node_modules which can be enormous.
     prune_dirs = {".git", "node_modules"}
 
-    for root, dirs, files in os.walk(base, followlinks=False):
+    base_s = str(base)
+    if not include_hidden:
+        # If any component of the base directory is hidden, there is nothing to export.
+        rel_base = base_s[prefix_len:]
+        if any(part.startswith(".") for part in rel_base.split(os.sep) if part):
+            return out
+
+    # Explicit stack + scandir: each entry costs a single lstat (DirEntry.stat
+    # caches it) instead of the lstat/is_symlink/is_file triple of os.walk.
+    stack = [base_s]
+    while stack:
         try:
-            root_path = Path(root)
-            rel_root = root_path.relative_to(APP_ROOT)
-        except Exception:
+            it = os.scandir(stack.pop())
+        except OSError:
             continue
+        with it:
+            for e in it:
+                name = e.name
+                if not include_hidden and name.startswith("."):
+                    continue
+                try:
+                    # Prune before the lstat: is_dir() answers from d_type for
+                    # real directories.
+                    if name in prune_dirs and e.is_dir():
+                        continue
+                    st = e.stat(follow_symlinks=False)
+                    # Matches os.walk: a symlink to a directory is listed as a
+                    # dir but never descended into.
+                    is_dir = e.is_dir()
+                except OSError:
+                    continue
 
-        # Prune selected dirs early.
-        dirs[:] = [d for d in dirs if d not in prune_dirs]
-
-        if not include_hidden:
-            # If any component of the directory is hidden, skip its contents.
-            if _is_hidden(rel_root.parts):
-                dirs[:] = []
-                continue
-            dirs[:] = [d for d in dirs if not d.startswith(".")]
-            files = [f for f in files if not f.startswith(".")]
-
-        for d in dirs:
-            full = root_path / d
-            rel = full.relative_to(APP_ROOT)
-            try:
-                st = full.lstat()
-            except Exception:
-                continue
-            out.append(
-                _ManifestEntry(
-                    path=str(rel),
-                    kind="dir",
-                    size=None,
-                    mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
-                    mode=int(st.st_mode) & 0o777,
-                    link_target=None,
-                )
-            )
-
-        for f in files:
-            full = root_path / f
-            rel = full.relative_to(APP_ROOT)
-            try:
-                st = full.lstat()
-            except Exception:
-                continue
+                rel = e.path[prefix_len:]
+                mode = st.st_mode
+                if is_dir:
+                    out.append(
+                        {
+                            "path": rel,
+                            "kind": "dir",
+                            "size": None,
+                            "mtime_ns": st.st_mtime_ns,
+                            "mode": mode & 0o777,
+                            "link_target": None,
+                        }
+                    )
+                    if not stat.S_ISLNK(mode):
+                        stack.append(e.path)
+                    continue
 
-            if full.is_symlink():
-                try:
-                    target = os.readlink(full)
-                except Exception:
-                    target = ""
-                out.append(
-                    _ManifestEntry(
-                        path=str(rel),
-                        kind="symlink",
-                        size=None,
-                        mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
-                        mode=int(st.st_mode) & 0o777,
-                        link_target=target,
+                if stat.S_ISLNK(mode):
+                    try:
+                        target = os.readlink(e.path)
+                    except OSError:
+                        target = ""
+                    out.append(
+                        {
+                            "path": rel,
+                            "kind": "symlink",
+                            "size": None,
+                            "mtime_ns": st.st_mtime_ns,
+                            "mode": mode & 0o777,
+                            "link_target": target,
+                        }
                     )
-                )
-                continue
+                    continue
 
-            if full.is_file():
-                out.append(
-                    _ManifestEntry(
-                        path=str(rel),
-                        kind="file",
-                        size=int(st.st_size),
-                        mtime_ns=int(getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9))),
-                        mode=int(st.st_mode) & 0o777,
-                        link_target=None,
+                if stat.S_ISREG(mode):
+                    out.append(
+                        {
+                            "path": rel,
+                            "kind": "file",
+                            "size": st.st_size,
+                            "mtime_ns": st.st_mtime_ns,
+                            "mode": mode & 0o777,
+                            "link_target": None,
+                        }
                     )
-                )
 
-    out.sort(key=lambda e: e.path)
+    out.sort(key=operator.itemgetter("path"))
     return out
 
 
 @app.get("/manifest")
-async def manifest(dir: str = ".", include_hidden: int = 1) -> dict:
+async def manifest(dir: str = ".", include_hidden: int = 1) -> Response:
     try:
         base = _safe_path(dir or ".")
     except ValueError as exc:
@@ -549,21 +727,91 @@ async def manifest(dir: str = ".", include_hidden: int = 1) -> dict:
     if not base.exists() or not base.is_dir():
         raise HTTPException(status_code=404, detail="dir not found")
 
-    entries = await asyncio.to_thread(
-        _walk_manifest, base, include_hidden=bool(int(include_hidden or 0))
+    entries = await _run_in_pool(
+        _io_pool, _walk_manifest, base, include_hidden=bool(int(include_hidden or 0))
     )
-    payload = [
-        {
-            "path": e.path,
-            "kind": e.kind,
-            "size": e.size,
-            "mtime_ns": e.mtime_ns,
-            "mode": e.mode,
-            "link_target": e.link_target,
-        }
-        for e in entries
-    ]
-    return {"entries": payload}
+    # Serialise with orjson and skip FastAPI's jsonable_encoder pass, which
+    # walks every entry dict again before the stdlib encoder does.
+    return Response(
+        content=orjson.dumps({"entries": entries}), media_type="application/json"
+    )
+
+
+def _decode_b64(content_b64: str) -> bytes:
+    # strict_mode validates while decoding, in one pass, and takes the str
+    # as-is; b64decode(validate=True) needs an encode() copy and a regex scan
+    # of the whole input first. Raises ValueError (binascii.Error, or non-ASCII
+    # input).
+    return binascii.a2b_base64(content_b64, strict_mode=True)
+
+
+# Payloads above this size are decoded in chunks instead of into one bytes
+# object as large as the file. The chunk is a multiple of 4 base64 chars, so
+# every chunk decodes on its own.
+_B64_STREAM_MIN = 1024 * 1024
+_B64_STREAM_CHUNK = 64 * 1024
+
+
+def _iter_decode_b64(content_b64: str) -> Iterator[bytes]:
+    n = len(content_b64)
+    for i in range(0, n, _B64_STREAM_CHUNK):
+        chunk = content_b64[i : i + _B64_STREAM_CHUNK]
+        # Padding is only valid at the very end of the whole input.
+        if i + _B64_STREAM_CHUNK < n and chunk.endswith("="):
+            raise ValueError("padding before end of data")
+        yield _decode_b64(chunk)
+
+
+def _write_file_chunks(full: Path, chunks: Iterable[bytes]) -> None:
+    # Raw fd writes skip the buffered file object (and its extra copy for large
+    # payloads); the parent directory is only created when the open says so.
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC
+    try:
+        fd = os.open(full, flags, 0o666)
+    except FileNotFoundError:
+        full.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(full, flags, 0o666)
+    try:
+        for chunk in chunks:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+# mkstemp creates files 0600; streamed writes get the mode a plain open() would.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _write_file_b64_streamed(full: Path, content_b64: str) -> None:
+    # Decode each chunk once, straight into a temp file next to the target,
+    # then rename it over the target: invalid input never touches the target
+    # and peak memory stays at one chunk.
+    try:
+        fd, tmp = tempfile.mkstemp(dir=full.parent, prefix=f".{full.name}.")
+    except FileNotFoundError:
+        full.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=full.parent, prefix=f".{full.name}.")
+    try:
+        try:
+            for chunk in _iter_decode_b64(content_b64):
+                view = memoryview(chunk)
+                while view:
+                    view = view[os.write(fd, view) :]
+            try:
+                mode = stat.S_IMODE(os.stat(full).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.fchmod(fd, mode)
+        finally:
+            os.close(fd)
+        os.replace(tmp, full)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
 
 
 @app.post("/write_b64")
@@ -573,14 +821,18 @@ async def write_b64(req: WriteB64Request) -> dict:
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
 
-    try:
-        payload = base64.b64decode(req.content_b64.encode("ascii"), validate=True)
-    except Exception:
-        raise HTTPException(status_code=400, detail="invalid base64")
-
     def _write_sync() -> None:
-        full.parent.mkdir(parents=True, exist_ok=True)
-        full.write_bytes(payload)
-
-    await asyncio.to_thread(_write_sync)
+        # Decode off the event loop too: a multi-MiB payload would otherwise
+        # stall every other request while binascii holds the GIL.
+        content_b64 = req.content_b64
+        try:
+            if len(content_b64) >= _B64_STREAM_MIN:
+                _write_file_b64_streamed(full, content_b64)
+                return
+            payload = _decode_b64(content_b64)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="invalid base64")
+        _write_file_chunks(full, (payload,))
+
+    await _run_in_pool(_cpu_pool, _write_sync)
     return {"ok": True, "path": str(req.path)}
@@ -2,68 +2,242 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import collections
+import concurrent.futures
 import contextlib
+import functools
 import json
 import logging
 import os
+import threading
 import time
 import uuid
-from dataclasses import dataclass
-from enum import Enum
+from dataclasses import dataclass, field
+from enum import StrEnum
 from typing import TYPE_CHECKING, Any, Literal
 
 if TYPE_CHECKING:  # pragma: no cover
-    from collections.abc import AsyncIterator
+    from collections.abc import AsyncIterator, Callable, Sequence
+
+try:
+    # Installed with langgraph/langsmith; the stdlib encoder is the fallback.
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
 
 logger = logging.getLogger(__name__)
 
 
+_JSON_SCALAR_TYPES = (bool, int, float)
+_CONTAINER_TYPES = (list, tuple, dict)
+
+
+def _drop_pending_frames(stack: list, base: int, out: dict, kk: str) -> None:
+    # Two source keys mapped to the same str() key: the later one wins, so drop
+    # the earlier key's not-yet-processed frame.
+    stack[base:] = [f for f in stack[base:] if f[0] is not out or f[1] != kk]
+
+
 def _safe_jsonable(obj: Any, *, max_str_len: int = 5000, max_depth: int = 6) -> Any:
-    if max_depth <= 0:
-        return "<truncated>"
-    if obj is None or isinstance(obj, (bool, int, float)):
-        return obj
-    if isinstance(obj, str):
-        return obj if len(obj) <= max_str_len else (obj[: max_str_len - 3] + "...")
-    if isinstance(obj, (list, tuple)):
-        return [
-            _safe_jsonable(x, max_str_len=max_str_len, max_depth=max_depth - 1)
-            for x in obj
-        ]
-    if isinstance(obj, dict):
-        out: dict[str, Any] = {}
-        for k, v in obj.items():
-            kk = str(k)
-            out[kk] = _safe_jsonable(
-                v, max_str_len=max_str_len, max_depth=max_depth - 1
+    # Iterative, with an explicit stack of (container, key, obj, depth) frames
+    # for nested containers only: scalar children are written straight into
+    # their parent while it is expanded. No Python frame per node and no
+    # recursion limit to hit.
+    root: list[Any] = [None]
+    stack: list[tuple[Any, Any, Any, int]] = [(root, 0, obj, max_depth)]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        container, key, node, depth = pop()
+        if depth <= 0:
+            container[key] = "<truncated>"
+            continue
+        if not isinstance(node, _CONTAINER_TYPES):
+            if node is None or isinstance(node, _JSON_SCALAR_TYPES):
+                container[key] = node
+            elif isinstance(node, str):
+                container[key] = (
+                    node
+                    if len(node) <= max_str_len
+                    else (node[: max_str_len - 3] + "...")
+                )
+            else:
+                # Fallback for non-serializable objects.
+                push((container, key, str(node), depth - 1))
+            continue
+
+        child_depth = depth - 1
+        if child_depth <= 0:
+            container[key] = (
+                dict.fromkeys((str(k) for k in node), "<truncated>")
+                if isinstance(node, dict)
+                else ["<truncated>"] * len(node)
             )
-        return out
-    # Fallback for non-serializable objects.
-    return _safe_jsonable(str(obj), max_str_len=max_str_len, max_depth=max_depth - 1)
+            continue
+        base = len(stack)
+        if isinstance(node, dict):
+            out: Any = {}
+            container[key] = out
+            for k, v in node.items():
+                kk = k if type(k) is str else str(k)
+                if kk in out and len(stack) > base:
+                    _drop_pending_frames(stack, base, out, kk)
+                t = type(v)
+                if v is None or t is bool or t is int or t is float:
+                    out[kk] = v
+                elif t is str:
+                    out[kk] = (
+                        v if len(v) <= max_str_len else (v[: max_str_len - 3] + "...")
+                    )
+                else:
+                    # Claim the slot now so keys keep their first-seen order.
+                    out[kk] = None
+                    push((out, kk, v, child_depth))
+        else:
+            out = [None] * len(node)
+            container[key] = out
+            for i, v in enumerate(node):
+                t = type(v)
+                if v is None or t is bool or t is int or t is float:
+                    out[i] = v
+                elif t is str:
+                    out[i] = (
+                        v if len(v) <= max_str_len else (v[: max_str_len - 3] + "...")
+                    )
+                else:
+                    push((out, i, v, child_depth))
+    return root[0]
+
+
+_MEDIA_DATA_KEYS = frozenset({"base64", "image_base64", "data"})
+_MEDIA_BLOCK_TYPES = frozenset({"image", "audio", "video", "file"})
 
 
 def _redact_large_media(obj: Any, *, max_depth: int = 8) -> Any:
-    if max_depth <= 0:
-        return "<truncated>"
-    if isinstance(obj, list):
-        return [_redact_large_media(v, max_depth=max_depth - 1) for v in obj]
-    if isinstance(obj, tuple):
-        return tuple(_redact_large_media(v, max_depth=max_depth - 1) for v in obj)
-    if not isinstance(obj, dict):
-        return obj
-
-    out: dict[str, Any] = {}
-    block_type = str(obj.get("type") or "").lower()
-    for k, v in obj.items():
-        kk = str(k)
-        if (
-            kk in ("base64", "image_base64", "data")
-            and isinstance(v, str)
-            and (kk != "data" or block_type in ("image", "audio", "video", "file"))
-        ):
-            out[kk] = f"<redacted:{len(v)} chars>"
+    # Same explicit-stack walk as _safe_jsonable. A frame whose depth is None
+    # runs after its children and turns the list built for a tuple back into
+    # a tuple.
+    root: list[Any] = [None]
+    stack: list[tuple[Any, Any, Any, int | None]] = [(root, 0, obj, max_depth)]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        container, key, node, depth = pop()
+        if depth is None:
+            container[key] = tuple(node)
+            continue
+        if depth <= 0:
+            container[key] = "<truncated>"
             continue
-        out[kk] = _redact_large_media(v, max_depth=max_depth - 1)
+        if not isinstance(node, _CONTAINER_TYPES):
+            container[key] = node
+            continue
+
+        child_depth = depth - 1
+        if isinstance(node, dict):
+            out: Any = {}
+            container[key] = out
+            base = len(stack)
+            # Most trace dicts carry no media fields; skip the per-key check.
+            has_media = not _MEDIA_DATA_KEYS.isdisjoint(node)
+            for k, v in node.items():
+                kk = k if type(k) is str else str(k)
+                if kk in out and len(stack) > base:
+                    _drop_pending_frames(stack, base, out, kk)
+                if (
+                    has_media
+                    and kk in _MEDIA_DATA_KEYS
+                    and isinstance(v, str)
+                    and (
+                        kk != "data"
+                        or str(node.get("type") or "").lower() in _MEDIA_BLOCK_TYPES
+                    )
+                ):
+                    out[kk] = f"<redacted:{len(v)} chars>"
+                elif child_depth <= 0:
+                    out[kk] = "<truncated>"
+                elif isinstance(v, _CONTAINER_TYPES):
+                    # Claim the slot now so keys keep their first-seen order.
+                    out[kk] = None
+                    push((out, kk, v, child_depth))
+                else:
+                    out[kk] = v
+        else:
+            out = [None] * len(node)
+            if isinstance(node, list):
+                container[key] = out
+            else:
+                push((container, key, out, None))
+            for i, v in enumerate(node):
+                if child_depth <= 0:
+                    out[i] = "<truncated>"
+                elif isinstance(v, _CONTAINER_TYPES):
+                    push((out, i, v, child_depth))
+                else:
+                    out[i] = v
+    return root[0]
+
+
+def _content_text(content: Any) -> str:
+    """Concatenate the text of str content or a list of str/text blocks."""
+    if isinstance(content, str):
+        return content
+    if not isinstance(content, list):
+        return ""
+    parts: list[str] = []
+    for item in content:
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, dict):
+            text = item.get("text")
+            if isinstance(text, str):
+                parts.append(text)
+    return "".join(parts)
+
+
+def _chunk_text(chunk: Any) -> str:
+    if chunk is None:
+        return ""
+    return _content_text(getattr(chunk, "content", None))
+
+
+def _message_text(msg: Any) -> str:
+    if msg is None:
+        return ""
+    if isinstance(msg, dict):
+        return _content_text(msg.get("content"))
+    return _content_text(getattr(msg, "content", None))
+
+
+def _repo_configurable(proj: Any, git: Any) -> dict[str, str]:
+    """Controller-graph configurable keys derived from project/git metadata."""
+    out: dict[str, str] = {}
+    if isinstance(proj, dict):
+        slug = proj.get("slug")
+        name = proj.get("name")
+        if isinstance(slug, str) and slug:
+            out["project_slug"] = slug
+        if isinstance(name, str) and name:
+            out["project_name"] = name
+
+    if isinstance(git, dict):
+        repo_url = git.get("http_url_to_repo") or git.get("repo_http_url")
+        if isinstance(repo_url, str) and repo_url:
+            out["git_repo_http_url"] = repo_url
+
+        # Back-compat: sometimes we only have a GitLab web URL.
+        if "git_repo_http_url" not in out:
+            web_url = git.get("web_url")
+            if isinstance(web_url, str) and web_url:
+                url = web_url.rstrip("/")
+                out["git_repo_http_url"] = url if url.endswith(".git") else url + ".git"
+
+        pwn = git.get("path_with_namespace")
+        web = git.get("web_url")
+        if isinstance(pwn, str) and pwn:
+            out["git_path_with_namespace"] = pwn
+        if isinstance(web, str) and web:
+            out["git_web_url"] = web
     return out
 
 
@@ -72,18 +246,33 @@ def _safe_trace_payload(obj: Any) -> Any:
 
 
 def _pretty_json(obj: Any) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                obj,
+                default=str,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS,
+            ).decode()
+        except TypeError:
+            # e.g. non-str keys or ints beyond 64 bits; let the stdlib try.
+            pass
     try:
         return json.dumps(obj, indent=2, sort_keys=True)
     except Exception:
         return str(obj)
 
 
+# Env settings are fixed for the life of the process, and several are read per
+# message; parse each once. Values that are lists/dicts stay uncached so
+# callers can't mutate shared state.
+@functools.lru_cache(maxsize=1)
 def _deepagents_model() -> str:
     return (
         os.environ.get("DEEPAGENTS_MODEL") or "anthropic:claude-sonnet-4-5-20250929"
     ).strip()
 
 
+@functools.lru_cache(maxsize=1)
 def _deepagents_validate() -> bool:
     return (os.environ.get("DEEPAGENTS_VALIDATE") or "").strip().lower() in (
         "1",
@@ -99,6 +288,7 @@ def _csv_env(name: str, default: str = "") -> list[str]:
     return [part.strip() for part in raw.split(",") if part.strip()]
 
 
+@functools.cache
 def _env_int(name: str, default: int) -> int:
     raw = (os.environ.get(name) or "").strip()
     if not raw:
@@ -123,6 +313,7 @@ def _deepagents_skills_sources() -> list[str]:
     )
 
 
+@functools.lru_cache(maxsize=1)
 def _deepagents_tool_retry_max_retries() -> int:
     return max(0, _env_int("DEEPAGENTS_TOOL_RETRY_MAX_RETRIES", 2))
 
@@ -140,10 +331,37 @@ def _runtime_ready_poll_ms() -> int:
     return max(50, _env_int("K8S_RUNTIME_READY_POLL_MS", 250))
 
 
+_RUNTIME_PROBE_INITIAL_DELAY_S = 0.05
+
+# Hasura calls that sandbox init overlaps with scaffolding and DB injection.
+_INIT_IO_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="agent-init"
+)
+_hasura_local = threading.local()
+
+
+def _thread_hasura_client():
+    # HasuraClient wraps a requests.Session, which is not thread-safe. Sandbox
+    # inits run concurrently on to_thread and _INIT_IO_POOL workers, so every
+    # thread keeps its own client instead of sharing one on the agent.
+    client = getattr(_hasura_local, "client", None)
+    if client is None:
+        from src.db.provisioning import hasura_client_from_env
+
+        client = hasura_client_from_env()
+        _hasura_local.client = client
+    return client
+
+
+def _call_with_init_hasura(fn: Callable[..., Any], /, **kwargs: Any) -> Any:
+    return fn(_thread_hasura_client(), **kwargs)
+
+
 def _flutter_screenshot_timeout_s() -> int:
     return max(15, _env_int("AMICABLE_FLUTTER_SCREENSHOT_TIMEOUT_S", 45))
 
 
+@functools.lru_cache(maxsize=1)
 def _langgraph_database_url() -> str:
     # Prefer an explicit DSN for LangGraph store/checkpointing.
     # Fall back to DATABASE_URL for compatibility with LangChain docs/examples.
@@ -155,6 +373,25 @@ def _langgraph_database_url() -> str:
     ).strip()
 
 
+@functools.lru_cache(maxsize=1)
+def _public_base_url() -> str:
+    # Origin the browser uses to reach the agent's /db proxy; "" means relative.
+    return (os.environ.get("AMICABLE_PUBLIC_BASE_URL") or "").strip().rstrip("/") or (
+        os.environ.get("PUBLIC_BASE_URL") or ""
+    ).strip().rstrip("/")
+
+
+@functools.lru_cache(maxsize=1)
+def _preview_base_domain() -> str:
+    return (os.environ.get("PREVIEW_BASE_DOMAIN") or "").strip().lstrip(".")
+
+
+@functools.lru_cache(maxsize=1)
+def _preview_scheme() -> str:
+    return (os.environ.get("PREVIEW_SCHEME") or "https").strip()
+
+
+@functools.lru_cache(maxsize=1)
 def _deepagents_summarization_model() -> str:
     # Prefer a cheap model for summarization.
     return (
@@ -164,19 +401,21 @@ def _deepagents_summarization_model() -> str:
     ).strip()
 
 
+@functools.lru_cache(maxsize=1)
 def _deepagents_summarization_trigger_messages() -> int:
     # Summarize once the message history grows too large.
     return max(5, _env_int("DEEPAGENTS_SUMMARIZATION_TRIGGER_MESSAGES", 50))
 
 
+@functools.lru_cache(maxsize=1)
 def _deepagents_summarization_keep_messages() -> int:
     # Keep the most recent messages verbatim after summarizing.
     return max(2, _env_int("DEEPAGENTS_SUMMARIZATION_KEEP_MESSAGES", 20))
 
 
 def _deepagents_interrupt_on() -> dict[str, Any]:
-    raw = (os.environ.get("DEEPAGENTS_HITL_INTERRUPT_ON_JSON") or "{}").strip()
-    if not raw:
+    raw = (os.environ.get("DEEPAGENTS_HITL_INTERRUPT_ON_JSON") or "").strip()
+    if raw in ("", "{}"):
         return {}
     try:
         parsed = json.loads(raw)
@@ -188,14 +427,48 @@ def _deepagents_interrupt_on() -> dict[str, Any]:
     return parsed if isinstance(parsed, dict) else {}
 
 
+# Optional integrations are resolved once per process; a failed import is
+# remembered as None instead of being retried on every call.
+@functools.cache
+def _langfuse_callback_handler_cls() -> type | None:
+    try:
+        from langfuse.langchain import CallbackHandler
+    except Exception:
+        logger.warning("Langfuse callback init failed; tracing disabled", exc_info=True)
+        return None
+    return CallbackHandler
+
+
+@functools.cache
+def _trace_narrator_cls() -> type | None:
+    try:
+        from src.trace_narrator import TraceNarrator
+    except Exception:
+        return None
+    return TraceNarrator
+
+
+@functools.cache
+def _async_postgres_saver_cls() -> type | None:
+    try:
+        from langgraph.checkpoint.postgres.aio import (
+            AsyncPostgresSaver,  # type: ignore
+        )
+    except Exception:
+        return None
+    return AsyncPostgresSaver
+
+
 def _langfuse_callback_handler():
     """Return a Langfuse CallbackHandler if configured, else None."""
     if not os.environ.get("LANGFUSE_PUBLIC_KEY"):
         return None
+    # Instances are per run: callers set session_id on the handler.
+    handler_cls = _langfuse_callback_handler_cls()
+    if handler_cls is None:
+        return None
     try:
-        from langfuse.langchain import CallbackHandler
-
-        return CallbackHandler()
+        return handler_cls()
     except Exception:
         logger.warning("Langfuse callback init failed; tracing disabled", exc_info=True)
         return None
@@ -262,6 +535,7 @@ async def _astream_controller_events_with_openinference(
             yield event
 
 
+@functools.lru_cache(maxsize=1)
 def _deepagents_qa_enabled() -> bool:
     # Backwards-compatible behavior: existing deployments set DEEPAGENTS_VALIDATE=1.
     from src.deepagents_backend.qa import qa_enabled_from_env
@@ -273,27 +547,70 @@ PermissionMode = Literal["default", "accept_edits", "bypass"]
 ThinkingLevel = Literal["none", "think", "think_hard", "ultrathink"]
 
 
+@functools.lru_cache(maxsize=1)
 def _default_permission_mode() -> PermissionMode:
     raw = (os.environ.get("AMICABLE_PERMISSION_MODE_DEFAULT") or "default").strip()
     return normalize_permission_mode(raw)
 
 
+# Lookup tables for the normalisers below. Values that are already canonical
+# (the common case) hit the table directly, before any strip()/lower().
+_PERMISSION_MODES: dict[str, PermissionMode] = {
+    "default": "default",
+    "accept_edits": "accept_edits",
+    "bypass": "bypass",
+}
+_THINKING_LEVELS: dict[str, ThinkingLevel] = {
+    "none": "none",
+    "think": "think",
+    "think_hard": "think_hard",
+    "ultrathink": "ultrathink",
+}
+_MESSAGE_CONTENT_MAX_DEPTH = 64
+
+# Prefixes _sanitize_user_history_text unwraps from stored user turns.
+_USER_HISTORY_WRAPPER_PREFIXES = (
+    "Thinking level:",
+    "Workspace instruction context:\n",
+    "Compacted conversation context:\n",
+)
+_HISTORY_MAX_TURNS = 250
+_COMPACT_SUMMARY_MAX_CHARS = 8_000
+# astream_events names checked for every streamed event.
+_CONTROLLER_TRACE_NODES = frozenset(
+    {"qa_validate", "self_heal_message", "qa_fail_summary", "git_sync"}
+)
+_TOOL_TRACE_NAMES = frozenset({"write_file", "edit_file", "execute"})
+_FILE_WRITE_TOOL_NAMES = frozenset({"write_file", "edit_file"})
+_MODEL_STREAM_EVENTS = frozenset({"on_chat_model_stream", "on_llm_stream"})
+_COMPACT_TEMPLATE = (
+    "Compacted conversation context:\n{summary}\n\nCurrent request:\n{user_text}"
+)
+_HISTORY_ROLES: dict[str, str] = {
+    "human": "user",
+    "user": "user",
+    "ai": "assistant",
+    "assistant": "assistant",
+}
+
+
+def _lookup_normalized(table: dict[str, Any], raw: Any) -> Any:
+    if type(raw) is str:
+        hit = table.get(raw)
+        if hit is not None:
+            return hit
+    return table.get(str(raw or "").strip().lower())
+
+
 def normalize_permission_mode(raw: Any) -> PermissionMode:
-    mode = str(raw or "").strip().lower()
-    if mode == "accept_edits":
-        return "accept_edits"
-    if mode == "bypass":
-        return "bypass"
-    return "default"
+    return _lookup_normalized(_PERMISSION_MODES, raw) or "default"
 
 
 def normalize_thinking_level(raw: Any) -> ThinkingLevel:
-    level = str(raw or "").strip().lower()
-    if level in ("think", "think_hard", "ultrathink"):
-        return level  # type: ignore[return-value]
-    return "none"
+    return _lookup_normalized(_THINKING_LEVELS, raw) or "none"
 
 
+@functools.lru_cache(maxsize=1)
 def _compaction_trigger_messages() -> int:
     # Keep defaults aligned with deepagents summarization thresholds.
     return max(
@@ -305,6 +622,27 @@ def _compaction_trigger_messages() -> int:
     )
 
 
+def _reset_env_cache() -> None:
+    """Forget memoised env settings (tests change the environment per case)."""
+    for fn in (
+        _env_int,
+        _deepagents_model,
+        _deepagents_validate,
+        _deepagents_tool_retry_max_retries,
+        _langgraph_database_url,
+        _public_base_url,
+        _preview_base_domain,
+        _preview_scheme,
+        _deepagents_summarization_model,
+        _deepagents_summarization_trigger_messages,
+        _deepagents_summarization_keep_messages,
+        _default_permission_mode,
+        _compaction_trigger_messages,
+        _deepagents_qa_enabled,
+    ):
+        fn.cache_clear()
+
+
 _DEEPAGENTS_SYSTEM_PROMPT = """You are Amicable, an AI editor for sandboxed application workspaces.
 
 Your job: implement the user's request by editing the live sandboxed codebase. The user can see a live preview.
@@ -345,7 +683,7 @@ Workflow (always):
 """
 
 
-class MessageType(Enum):
+class MessageType(StrEnum):
     INIT = "init"
     USER = "user"
     AGENT_PARTIAL = "agent_partial"
@@ -363,13 +701,28 @@ class MessageType(Enum):
     PING = "ping"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Message:
     id: str
-    timestamp: int
+    timestamp_ns: int
     type: MessageType
     data: dict
     session_id: str
+    _as_dict: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Messages are immutable, so the wire dict is built exactly once.
+        object.__setattr__(
+            self,
+            "_as_dict",
+            {
+                "id": self.id,
+                "type": self.type,
+                "data": self.data,
+                "timestamp": self.timestamp_ns // 1_000_000,
+                "session_id": self.session_id,
+            },
+        )
 
     @classmethod
     def new(
@@ -382,19 +735,13 @@ class Message:
         return cls(
             type=type,
             data=data,
-            id=id or str(uuid.uuid4()),
-            timestamp=time.time_ns() // 1_000_000,
-            session_id=session_id or str(uuid.uuid4()),
+            id=id or uuid.uuid4().hex,
+            timestamp_ns=time.time_ns(),
+            session_id=session_id or uuid.uuid4().hex,
         )
 
     def to_dict(self) -> dict:
-        return {
-            "id": self.id,
-            "type": self.type.value,
-            "data": self.data,
-            "timestamp": self.timestamp,
-            "session_id": self.session_id,
-        }
+        return self._as_dict
 
 
 class ChatHistoryPersistenceError(RuntimeError):
@@ -429,7 +776,15 @@ class Agent:
 
         # Avoid double-provisioning or double-injection for the same session_id when multiple
         # concurrent WS/HTTP requests hit init paths.
-        self._ensure_env_lock_by_session: dict[str, asyncio.Lock] = {}
+        self._ensure_env_lock_by_session: collections.defaultdict[str, asyncio.Lock] = (
+            collections.defaultdict(asyncio.Lock)
+        )
+
+        # Controller configurable keys derived from session project/git metadata,
+        # keyed by session_id and tagged with the source objects.
+        self._repo_configurable_by_session: dict[
+            str, tuple[Any, Any, dict[str, str]]
+        ] = {}
 
         # Optional lifecycle hooks (fail-open).
         self._hook_bus = None
@@ -440,18 +795,31 @@ class Agent:
         except Exception:
             self._hook_bus = None
 
+    def _hasura_client(self):
+        return _thread_hasura_client()
+
+    def _session_repo_configurable(self, session_id: str) -> dict[str, str]:
+        # ws_server replaces the project/git dicts rather than mutating them, so
+        # the derived keys stay valid while both objects are unchanged.
+        init_data = self.session_data.get(session_id)
+        proj = init_data.get("project") if isinstance(init_data, dict) else None
+        git = init_data.get("git") if isinstance(init_data, dict) else None
+        cached = self._repo_configurable_by_session.get(session_id)
+        if cached is not None and cached[0] is proj and cached[1] is git:
+            return cached[2]
+        out = _repo_configurable(proj, git)
+        self._repo_configurable_by_session[session_id] = (proj, git, out)
+        return out
+
     def _ensure_env_lock(self, session_id: str) -> asyncio.Lock:
-        lock = self._ensure_env_lock_by_session.get(session_id)
-        if lock is None:
-            lock = asyncio.Lock()
-            self._ensure_env_lock_by_session[session_id] = lock
-        return lock
+        return self._ensure_env_lock_by_session[session_id]
 
     def cleanup_session_state(self, session_id: str) -> None:
         """Best-effort in-memory cleanup for deleted/expired sessions."""
         self.session_data.pop(session_id, None)
         self._hitl_pending.pop(session_id, None)
         self._ensure_env_lock_by_session.pop(session_id, None)
+        self._repo_configurable_by_session.pop(session_id, None)
 
     def _probe_runtime_or_raise(
         self,
@@ -460,6 +828,7 @@ class Agent:
         session_id: str,
         sandbox_id: str,
         sandbox_is_new: bool = False,
+        command: str = "true",
     ) -> None:
         start = time.monotonic()
         timeout_s = (
@@ -468,13 +837,16 @@ class Agent:
             else _runtime_ready_timeout_s()
         )
         deadline = start + float(timeout_s)
+        # Exponential backoff: warm runtimes usually answer within a few tens of
+        # milliseconds, so retry quickly first and back off to the poll interval.
         poll_s = float(_runtime_ready_poll_ms()) / 1000.0
+        delay_s = min(poll_s, _RUNTIME_PROBE_INITIAL_DELAY_S)
         attempts = 0
         probe_exc: Exception | None = None
         while True:
             attempts += 1
             try:
-                backend.execute("true")
+                backend.execute(command)
                 elapsed_ms = int((time.monotonic() - start) * 1000)
                 logger.info(
                     "sandbox_init_stage session_id=%s sandbox_id=%s stage=runtime_probe "
@@ -490,7 +862,8 @@ class Agent:
                 now = time.monotonic()
                 if now >= deadline:
                     break
-                time.sleep(min(poll_s, max(0.01, deadline - now)))
+                time.sleep(min(delay_s, max(0.01, deadline - now)))
+                delay_s = min(poll_s, delay_s * 2)
 
         elapsed_ms = int((time.monotonic() - start) * 1000)
         logger.warning(
@@ -527,18 +900,15 @@ class Agent:
             )
             return None
 
-        try:
-            from langgraph.checkpoint.postgres.aio import (
-                AsyncPostgresSaver,  # type: ignore
-            )
-        except Exception:
+        saver_cls = _async_postgres_saver_cls()
+        if saver_cls is None:
             logger.warning(
                 "AsyncPostgresSaver unavailable (install langgraph-checkpoint-postgres + psycopg[binary]); checkpointing stays in-memory"
             )
             return None
 
         try:
-            ctx = AsyncPostgresSaver.from_conn_string(dsn)
+            ctx = saver_cls.from_conn_string(dsn)
             checkpointer = await ctx.__aenter__()
             await checkpointer.setup()
         except Exception:
@@ -559,14 +929,24 @@ class Agent:
         # Lazy import to keep minimal env behavior.
         if self._trace_narrator is not None:
             return self._trace_narrator
+        narrator_cls = _trace_narrator_cls()
+        if narrator_cls is None:
+            return None
         try:
-            from src.trace_narrator import TraceNarrator
-
-            self._trace_narrator = TraceNarrator()
+            self._trace_narrator = narrator_cls()
         except Exception:
             self._trace_narrator = None
         return self._trace_narrator
 
+    def _session_meta(self, session_id: str) -> dict[str, Any]:
+        """Return the session's metadata dict, creating it when missing."""
+        meta = self.session_data.get(session_id)
+        if isinstance(meta, dict):
+            return meta
+        meta = {}
+        self.session_data[session_id] = meta
+        return meta
+
     def set_session_controls(
         self,
         session_id: str,
@@ -574,11 +954,7 @@ class Agent:
         permission_mode: str | None = None,
         thinking_level: str | None = None,
     ) -> None:
-        meta = self.session_data.get(session_id)
-        if not isinstance(meta, dict):
-            meta = {}
-            self.session_data[session_id] = meta
-
+        meta = self._session_meta(session_id)
         current_mode = meta.get("permission_mode")
         current_level = meta.get("thinking_level")
         mode = normalize_permission_mode(
@@ -615,10 +991,9 @@ class Agent:
         return "none"
 
     def _conversation_history(self, session_id: str) -> list[dict[str, str]]:
-        init_data = self.session_data.get(session_id)
-        if not isinstance(init_data, dict):
-            init_data = {}
-            self.session_data[session_id] = init_data
+        # Kept a plain list: session_data is sent as the WS INIT payload via
+        # json.dumps.
+        init_data = self._session_meta(session_id)
         raw = init_data.get("_conversation_history")
         if isinstance(raw, list):
             return raw
@@ -632,40 +1007,54 @@ class Agent:
             return
         history = self._conversation_history(session_id)
         history.append({"role": role, "text": t[:4000]})
-        if len(history) > 250:
-            del history[: len(history) - 250]
+        if len(history) > _HISTORY_MAX_TURNS:
+            del history[: len(history) - _HISTORY_MAX_TURNS]
 
     def _normalize_history_role(self, raw: Any) -> str | None:
-        role = str(raw or "").strip().lower()
-        if role in ("human", "user"):
-            return "user"
-        if role in ("ai", "assistant"):
-            return "assistant"
-        return None
+        return _lookup_normalized(_HISTORY_ROLES, raw)
 
     def _message_content_to_text(self, content: Any) -> str:
-        if content is None:
-            return ""
-        if isinstance(content, str):
+        if type(content) is str:
             return content
-        if isinstance(content, list):
+        if type(content) is list:
+            # Common LangChain shape: a flat list of text blocks.
             parts: list[str] = []
             for item in content:
-                text = self._message_content_to_text(item)
-                if text:
+                if type(item) is str:
+                    parts.append(item)
+                    continue
+                text = item.get("text") if type(item) is dict else None
+                if type(text) is not str:
+                    break
+                parts.append(text)
+            else:
+                return "".join(parts)
+        # Explicit stack instead of recursion; children are pushed reversed so
+        # parts come out in document order. The depth cap guards against
+        # objects whose .content never bottoms out.
+        parts = []
+        stack: list[tuple[Any, int]] = [(content, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if node is None or depth > _MESSAGE_CONTENT_MAX_DEPTH:
+                continue
+            if isinstance(node, str):
+                parts.append(node)
+            elif isinstance(node, list):
+                stack.extend((item, depth + 1) for item in reversed(node))
+            elif isinstance(node, dict):
+                text = node.get("text")
+                if isinstance(text, str):
                     parts.append(text)
-            return "".join(parts)
-        if isinstance(content, dict):
-            text = content.get("text")
-            if isinstance(text, str):
-                return text
-            nested = content.get("content")
-            return self._message_content_to_text(nested)
-        text_attr = getattr(content, "text", None)
-        if isinstance(text_attr, str):
-            return text_attr
-        nested_attr = getattr(content, "content", None)
-        return self._message_content_to_text(nested_attr)
+                else:
+                    stack.append((node.get("content"), depth + 1))
+            else:
+                text_attr = getattr(node, "text", None)
+                if isinstance(text_attr, str):
+                    parts.append(text_attr)
+                else:
+                    stack.append((getattr(node, "content", None), depth + 1))
+        return "".join(parts)
 
     def _strip_thinking_prefix(self, text: str) -> str:
         out = text.strip()
@@ -678,7 +1067,12 @@ class Agent:
         return out[idx + len(sep) :].strip()
 
     def _sanitize_user_history_text(self, text: str) -> str:
-        out = self._strip_thinking_prefix(text)
+        out = text.strip()
+        # Plain user turns (the common case) carry none of the wrappers below;
+        # one tuple startswith settles that without the per-stage passes.
+        if not out.startswith(_USER_HISTORY_WRAPPER_PREFIXES):
+            return out
+        out = self._strip_thinking_prefix(out)
 
         workspace_prefix = "Workspace instruction context:\n"
         workspace_marker = "\n\nUser request:\n"
@@ -726,7 +1120,10 @@ class Agent:
         if role is None:
             return None
 
-        text = self._message_content_to_text(content).strip()
+        if type(content) is str:
+            text = content.strip()
+        else:
+            text = self._message_content_to_text(content).strip()
         if not text:
             return None
         if role == "user":
@@ -736,27 +1133,28 @@ class Agent:
         return role, text[:4000]
 
     def _normalize_conversation_history(
-        self, items: list[Any]
+        self, items: Sequence[Any]
     ) -> list[dict[str, str]]:
+        # Walk from the newest item and stop once the cap is reached, so
+        # turns that would be dropped anyway are never parsed.
         out: list[dict[str, str]] = []
-        for item in items:
+        for item in reversed(items):
             parsed = self._history_item_role_text(item)
             if parsed is None:
                 continue
             role, text = parsed
             out.append({"role": role, "text": text})
-        if len(out) > 250:
-            out = out[-250:]
+            if len(out) >= _HISTORY_MAX_TURNS:
+                break
+        out.reverse()
         return out
 
     def _set_conversation_history(
         self, session_id: str, history: list[dict[str, str]]
     ) -> None:
-        init_data = self.session_data.get(session_id)
-        if not isinstance(init_data, dict):
-            init_data = {}
-            self.session_data[session_id] = init_data
-        init_data["_conversation_history"] = history[-250:]
+        self._session_meta(session_id)["_conversation_history"] = history[
+            -_HISTORY_MAX_TURNS:
+        ]
 
     def _state_values_from_snapshot(self, snapshot: Any) -> dict[str, Any]:
         if isinstance(snapshot, dict):
@@ -960,8 +1358,9 @@ class Agent:
         if keep_recent < 1:
             keep_recent = 1
 
-        recent = history[-keep_recent:] if keep_recent < len(history) else list(history)
-        older = history[: max(0, len(history) - len(recent))]
+        split = max(0, len(history) - keep_recent)
+        recent = history[split:]
+        older = history[:split]
 
         init_data = self.session_data.get(session_id)
         prior_summary = ""
@@ -970,37 +1369,41 @@ class Agent:
             if isinstance(ps, str):
                 prior_summary = ps
 
-        bullets: list[str] = []
-        if prior_summary.strip():
-            bullets.append(prior_summary.strip())
+        # Lines are stripped on push and collection stops once the cap is
+        # reached, so the joined summary is never much longer than the cap.
+        lines: list[str] = []
+        total_len = -1
+        prior_summary = prior_summary.strip()
+        if prior_summary:
+            lines.append(f"- {prior_summary}")
+            total_len += len(lines[-1]) + 1
         for item in older[-80:]:
+            if total_len >= _COMPACT_SUMMARY_MAX_CHARS:
+                break
             if not isinstance(item, dict):
                 continue
             role = str(item.get("role") or "msg")
             text = str(item.get("text") or "").replace("\n", " ").strip()
             if text:
-                bullets.append(f"{role}: {text[:220]}")
+                lines.append(f"- {role}: {text[:220]}")
+                total_len += len(lines[-1]) + 1
 
-        if isinstance(init_data, dict):
+        if total_len < _COMPACT_SUMMARY_MAX_CHARS and isinstance(init_data, dict):
             qa_last = init_data.get("_last_qa_failure")
             if isinstance(qa_last, str) and qa_last.strip():
-                bullets.append(f"last_qa_failure: {qa_last[:900]}")
-        if session_id in self._hitl_pending:
-            bullets.append("pending_hitl: unresolved approval is in progress")
+                lines.append(f"- last_qa_failure: {qa_last[:900].rstrip()}")
+                total_len += len(lines[-1]) + 1
+        if total_len < _COMPACT_SUMMARY_MAX_CHARS and session_id in self._hitl_pending:
+            lines.append("- pending_hitl: unresolved approval is in progress")
 
-        merged_summary = "\n".join(f"- {b}" for b in bullets if b.strip()).strip()
-        if len(merged_summary) > 8_000:
-            merged_summary = merged_summary[:8_000]
+        merged_summary = "\n".join(lines)[:_COMPACT_SUMMARY_MAX_CHARS]
 
         if isinstance(init_data, dict):
             init_data["_conversation_summary"] = merged_summary
             init_data["_conversation_history"] = recent
 
-        compacted = (
-            "Compacted conversation context:\n"
-            f"{merged_summary}\n\n"
-            "Current request:\n"
-            f"{user_text}"
+        compacted = _COMPACT_TEMPLATE.format(
+            summary=merged_summary, user_text=user_text
         )
         return compacted, {
             "history_before": len(history),
@@ -1094,7 +1497,7 @@ class Agent:
             )
             stage_start = time.monotonic()
 
-        from src.db.provisioning import hasura_client_from_env, require_hasura_from_env
+        from src.db.provisioning import ensure_app, require_hasura_from_env
         from src.deepagents_backend.session_sandbox_manager import SessionSandboxManager
         from src.templates.registry import (
             default_template_id,
@@ -1110,32 +1513,39 @@ class Agent:
             self._session_manager = SessionSandboxManager()
         _log_stage("session_manager_ready")
 
+        # The project row answers the missing slug, the stored template and the
+        # scaffold metadata below, so it is fetched at most once per init.
+        project: Any = None
+        project_loaded = False
+
+        def _load_project() -> Any:
+            nonlocal project, project_loaded
+            if not project_loaded:
+                project_loaded = True
+                try:
+                    from src.projects.store import get_project_any_owner
+
+                    project = get_project_any_owner(
+                        self._hasura_client(), project_id=session_id
+                    )
+                except Exception:
+                    project = None
+            return project
+
         # Resolve missing slug from the DB so all init paths (WS + HTTP sandbox FS)
         # can create/reuse the same sandbox and generate stable preview URLs.
         effective_slug = slug
         if effective_slug is None:
-            try:
-                from src.projects.store import get_project_any_owner
-
-                client = hasura_client_from_env()
-                p = get_project_any_owner(client, project_id=session_id)
-                if p is not None and isinstance(p.slug, str) and p.slug.strip():
-                    effective_slug = p.slug.strip()
-            except Exception:
-                effective_slug = slug
+            p = _load_project()
+            if p is not None and isinstance(p.slug, str) and p.slug.strip():
+                effective_slug = p.slug.strip()
 
         effective_template_id = parse_template_id(template_id) if template_id else None
         if effective_template_id is None:
-            try:
-                from src.projects.store import get_project_template_id_any_owner
-
-                client = hasura_client_from_env()
-                stored = get_project_template_id_any_owner(
-                    client, project_id=session_id
-                )
-                effective_template_id = parse_template_id(stored)
-            except Exception:
-                effective_template_id = None
+            p = _load_project()
+            effective_template_id = (
+                parse_template_id(p.template_id) if p is not None else None
+            )
         if effective_template_id is None:
             effective_template_id = default_template_id()
 
@@ -1155,19 +1565,33 @@ class Agent:
 
         # Poll the sandbox runtime API until it accepts connections. Fail closed if
         # it never becomes reachable to avoid persisting a broken session.
+        # The probe command also ensures the conventional memories directory
+        # exists inside the sandbox workspace (sandbox-local, not store-backed);
+        # execute() reports a failing mkdir as an exit code, not an exception.
         self._probe_runtime_or_raise(
             backend=backend,
             session_id=session_id,
             sandbox_id=sess.sandbox_id,
             sandbox_is_new=not sess.exists,
+            command="cd /app && mkdir -p memories",
         )
         _log_stage("runtime_probe")
 
-        # Ensure the conventional memories directory exists inside the sandbox workspace.
-        # (This is sandbox-local, not store-backed.)
-        with contextlib.suppress(Exception):
-            backend.execute("cd /app && mkdir -p memories")
-        _log_stage("memory_dir_ensure")
+        # DB provisioning and the sandbox_id persist (best-effort, for preview
+        # routing and debugging) only start once the runtime answered, so a
+        # failed claim or probe never abandons a provisioning call. Everything
+        # up to the joins below is best-effort and does not raise.
+        from src.projects.store import set_project_sandbox_id_any_owner
+
+        app_future = _INIT_IO_POOL.submit(
+            _call_with_init_hasura, ensure_app, app_id=session_id
+        )
+        persist_future = _INIT_IO_POOL.submit(
+            _call_with_init_hasura,
+            set_project_sandbox_id_any_owner,
+            project_id=session_id,
+            sandbox_id=str(sess.sandbox_id),
+        )
 
         init_data: dict[str, Any] = {
             # Prefer a slug-based preview hostname when we have a slug. With the
@@ -1186,27 +1610,11 @@ class Agent:
             "_last_qa_failure": "",
         }
 
-        # Persist sandbox_id (best-effort) for preview routing and debugging.
-        try:
-            from src.projects.store import set_project_sandbox_id_any_owner
-
-            client = hasura_client_from_env()
-            set_project_sandbox_id_any_owner(
-                client, project_id=session_id, sandbox_id=str(sess.sandbox_id)
-            )
-        except Exception:
-            pass
-        _log_stage("persist_sandbox_id")
-
         # Now that we have both PREVIEW_BASE_DOMAIN and the slug, override the
         # init preview URL to use the slug host label if possible.
-        try:
-            base = (os.environ.get("PREVIEW_BASE_DOMAIN") or "").strip().lstrip(".")
-            scheme = (os.environ.get("PREVIEW_SCHEME") or "https").strip()
-            if effective_slug and base:
-                init_data["url"] = f"{scheme}://{effective_slug}.{base}/"
-        except Exception:
-            pass
+        base = _preview_base_domain()
+        if effective_slug and base:
+            init_data["url"] = f"{_preview_scheme()}://{effective_slug}.{base}/"
         _log_stage("preview_url_finalize")
 
         # Platform scaffolding: Backstage + SonarQube + TechDocs (+ optional CI).
@@ -1219,27 +1627,18 @@ class Agent:
 
             should_scaffold = (not bool(sess.exists)) or scaffold_on_existing_enabled()
             if should_scaffold:
-                if backend is None:
-                    backend = self._session_manager.get_backend(session_id)
-
                 project_name = None
                 project_slug = slug
                 project_prompt = None
                 repo_web_url = None
 
                 # Best-effort project metadata from Hasura (no ownership enforcement).
-                try:
-                    from src.projects.store import get_project_any_owner
-
-                    client = hasura_client_from_env()
-                    p = get_project_any_owner(client, project_id=session_id)
-                    if p is not None:
-                        project_name = p.name
-                        project_slug = p.slug
-                        project_prompt = p.project_prompt
-                        repo_web_url = p.gitlab_web_url
-                except Exception:
-                    pass
+                p = _load_project()
+                if p is not None:
+                    project_name = p.name
+                    project_slug = p.slug
+                    project_prompt = p.project_prompt
+                    repo_web_url = p.gitlab_web_url
 
                 # GitLab context for source-location/repo_url fallback.
                 try:
@@ -1278,73 +1677,44 @@ class Agent:
         # DB provisioning + sandbox injection (required).
         from urllib.parse import urlparse
 
-        from src.db.provisioning import ensure_app, rotate_app_key, verify_app_key
+        from src.db.provisioning import rotate_app_key, verify_app_key
         from src.db.sandbox_inject import (
-            ensure_index_includes_db_script,
-            ensure_laravel_welcome_includes_db_script,
-            ensure_next_layout_includes_db_script,
-            ensure_nuxt_config_includes_db_script,
-            ensure_remix_root_includes_db_script,
-            ensure_sveltekit_app_html_includes_db_script,
-            laravel_db_paths,
-            next_db_paths,
-            nuxt_db_paths,
+            db_inject_target,
             parse_db_js,
-            remix_db_paths,
             render_db_js,
-            render_runtime_js,
+            render_runtime_js_bytes,
             runtime_js_path_for_inject_kind,
-            sveltekit_db_paths,
-            vite_db_paths,
         )
         from src.templates.registry import template_spec
 
-        client = hasura_client_from_env()
-        app = ensure_app(client, app_id=session_id)
+        client = self._hasura_client()
+        app = app_future.result()
+        _log_stage("db_app_ready")
 
         # Build proxy URL for the browser to call (no Hasura secrets).
-        public_base = (os.environ.get("AMICABLE_PUBLIC_BASE_URL") or "").strip().rstrip(
-            "/"
-        ) or (os.environ.get("PUBLIC_BASE_URL") or "").strip().rstrip("/")
+        public_base = _public_base_url()
         graphql_path = f"/db/apps/{session_id}/graphql"
         graphql_url = f"{public_base}{graphql_path}" if public_base else graphql_path
 
-        backend = self._session_manager.get_backend(session_id)
         spec = template_spec(effective_template_id)
         inject_kind = spec.db_inject_kind
 
-        db_js_path = "/amicable-db.js"
-        runtime_js_path = "/amicable-runtime.js"
-        entry_paths: tuple[str, ...] = ()
-        ensure_entry = None
-        if inject_kind == "vite_index_html":
-            db_js_path, index_path = vite_db_paths()
-            entry_paths = (index_path,)
-            ensure_entry = ensure_index_includes_db_script
-        elif inject_kind == "next_layout_tsx":
-            db_js_path, entry_paths = next_db_paths()
-            ensure_entry = ensure_next_layout_includes_db_script
-        elif inject_kind == "remix_root_tsx":
-            db_js_path, entry_paths = remix_db_paths()
-            ensure_entry = ensure_remix_root_includes_db_script
-        elif inject_kind == "nuxt_config_ts":
-            db_js_path, entry_paths = nuxt_db_paths()
-            ensure_entry = ensure_nuxt_config_includes_db_script
-        elif inject_kind == "sveltekit_app_html":
-            db_js_path, app_html = sveltekit_db_paths()
-            entry_paths = (app_html,)
-            ensure_entry = ensure_sveltekit_app_html_includes_db_script
-        elif inject_kind == "laravel_blade":
-            db_js_path, entry_paths = laravel_db_paths()
-            ensure_entry = ensure_laravel_welcome_includes_db_script
+        db_js_path, entry_paths, ensure_entry = db_inject_target(inject_kind)
         runtime_js_path = runtime_js_path_for_inject_kind(inject_kind)
 
+        # One sandbox download covers both reads below: the existing db file
+        # (only needed when Hasura has no plaintext app_key) and the entrypoint.
+        app_key = app.app_key
+        read_paths = [] if app_key else [db_js_path]
+        entry_offset = len(read_paths)
+        if ensure_entry is not None:
+            read_paths.extend(entry_paths)
+        downloads = backend.download_files(read_paths) if read_paths else []
+
         # Determine app_key to inject:
         # - if newly created/rotated, we have plaintext app_key
         # - else, attempt to read it from the sandbox and validate against stored hash
-        app_key = app.app_key
         if not app_key:
-            downloads = backend.download_files([db_js_path])
             existing_key: str | None = None
             if (
                 downloads
@@ -1377,45 +1747,38 @@ class Agent:
                 app_key=app_key,
                 preview_origin=preview_origin,
             )
-            runtime_js = render_runtime_js()
 
             # Ensure the browser gets the injected db file. Optionally patch
             # the stack entrypoint to include the script tag.
-            if entry_paths and ensure_entry is not None:
-                downloads = backend.download_files(list(entry_paths))
-                entry_path = None
-                entry_text = ""
-                for idx, d in enumerate(downloads):
+            uploads = [
+                (db_js_path, db_js.encode("utf-8")),
+                (runtime_js_path, render_runtime_js_bytes()),
+            ]
+            if ensure_entry is not None:
+                for entry_path, d in zip(
+                    entry_paths, downloads[entry_offset:], strict=False
+                ):
                     if d.error is None and d.content is not None:
-                        entry_path = entry_paths[idx]
                         entry_text = d.content.decode("utf-8", errors="replace")
+                        if entry_text:
+                            updated = ensure_entry(entry_text)
+                            uploads.append((entry_path, updated.encode("utf-8")))
                         break
-
-                if entry_path and entry_text:
-                    updated = ensure_entry(entry_text)
-                    backend.upload_files(
-                        [
-                            (db_js_path, db_js.encode("utf-8")),
-                            (runtime_js_path, runtime_js.encode("utf-8")),
-                            (entry_path, updated.encode("utf-8")),
-                        ]
-                    )
-                else:
-                    backend.upload_files(
-                        [
-                            (db_js_path, db_js.encode("utf-8")),
-                            (runtime_js_path, runtime_js.encode("utf-8")),
-                        ]
-                    )
-            else:
-                backend.upload_files(
-                    [
-                        (db_js_path, db_js.encode("utf-8")),
-                        (runtime_js_path, runtime_js.encode("utf-8")),
-                    ]
-                )
+            backend.upload_files(uploads)
         _log_stage("db_inject")
 
+        try:
+            persist_future.result()
+            _log_stage("persist_sandbox_id")
+        except Exception:
+            logger.warning(
+                "persisting sandbox_id failed (continuing) session_id=%s sandbox_id=%s",
+                session_id,
+                sess.sandbox_id,
+                exc_info=True,
+            )
+            _log_stage("persist_sandbox_id", status="failed")
+
         init_data["app_id"] = session_id
         init_data["db"] = {"graphql_url": graphql_url}
         init_data["db_schema"] = app.schema_name
@@ -1594,48 +1957,7 @@ class Agent:
         }
 
         # Provide project/git metadata to the controller graph (best-effort).
-        try:
-            init_data = self.session_data.get(session_id) or {}
-            proj = init_data.get("project") if isinstance(init_data, dict) else None
-            git = init_data.get("git") if isinstance(init_data, dict) else None
-
-            if isinstance(proj, dict):
-                slug = proj.get("slug")
-                name = proj.get("name")
-                if isinstance(slug, str) and slug:
-                    config["configurable"]["project_slug"] = slug
-                if isinstance(name, str) and name:
-                    config["configurable"]["project_name"] = name
-
-            if isinstance(git, dict):
-                repo_url = git.get("http_url_to_repo") or git.get("repo_http_url")
-                if isinstance(repo_url, str) and repo_url:
-                    config["configurable"]["git_repo_http_url"] = repo_url
-
-                # Additional back-compat: accept "http_url_to_repo" directly.
-                if "git_repo_http_url" not in config["configurable"]:
-                    repo_url2 = git.get("http_url_to_repo")
-                    if isinstance(repo_url2, str) and repo_url2:
-                        config["configurable"]["git_repo_http_url"] = repo_url2
-
-                # Back-compat: sometimes we only have a GitLab web URL.
-                if "git_repo_http_url" not in config["configurable"]:
-                    web_url = git.get("web_url")
-                    if isinstance(web_url, str) and web_url:
-                        url = web_url.rstrip("/")
-                        if url.endswith(".git"):
-                            config["configurable"]["git_repo_http_url"] = url
-                        else:
-                            config["configurable"]["git_repo_http_url"] = url + ".git"
-
-                pwn = git.get("path_with_namespace")
-                web = git.get("web_url")
-                if isinstance(pwn, str) and pwn:
-                    config["configurable"]["git_path_with_namespace"] = pwn
-                if isinstance(web, str) and web:
-                    config["configurable"]["git_web_url"] = web
-        except Exception:
-            pass
+        config["configurable"].update(self._session_repo_configurable(session_id))
         lf = _langfuse_callback_handler()
         if lf is not None:
             lf.session_id = session_id
@@ -1757,46 +2079,6 @@ class Agent:
             ]
             content_blocks = [{"type": "text", "text": user_text}, *non_text_blocks]
 
-        def _chunk_text(chunk: Any) -> str:
-            if chunk is None:
-                return ""
-            content = getattr(chunk, "content", None)
-            if isinstance(content, str):
-                return content
-            if isinstance(content, list):
-                parts: list[str] = []
-                for item in content:
-                    if isinstance(item, str):
-                        parts.append(item)
-                    elif isinstance(item, dict):
-                        text = item.get("text")
-                        if isinstance(text, str):
-                            parts.append(text)
-                return "".join(parts)
-            return ""
-
-        def _message_text(msg: Any) -> str:
-            if msg is None:
-                return ""
-            if isinstance(msg, dict):
-                content = msg.get("content")
-            else:
-                content = getattr(msg, "content", None)
-
-            if isinstance(content, str):
-                return content
-            if isinstance(content, list):
-                parts: list[str] = []
-                for item in content:
-                    if isinstance(item, str):
-                        parts.append(item)
-                    elif isinstance(item, dict):
-                        text = item.get("text")
-                        if isinstance(text, str):
-                            parts.append(text)
-                return "".join(parts)
-            return ""
-
         def _is_ai_message(msg: Any) -> bool:
             if isinstance(msg, dict):
                 t = (msg.get("type") or msg.get("role") or "").lower()
@@ -1831,12 +2113,7 @@ class Agent:
                 name = event.get("name")
                 data = event.get("data") or {}
 
-                if etype == "on_chain_start" and name in (
-                    "qa_validate",
-                    "self_heal_message",
-                    "qa_fail_summary",
-                    "git_sync",
-                ):
+                if etype == "on_chain_start" and name in _CONTROLLER_TRACE_NODES:
                     if name == "git_sync":
                         saw_git_sync = True
                     text = None
@@ -1902,12 +2179,12 @@ class Agent:
                 if (
                     etype == "on_tool_start"
                     and isinstance(name, str)
-                    and name in ("write_file", "edit_file", "execute")
+                    and name in _TOOL_TRACE_NAMES
                 ):
                     tool_input = data.get("input") or {}
                     text = None
                     if isinstance(tool_input, dict):
-                        if name in ("write_file", "edit_file"):
+                        if name in _FILE_WRITE_TOOL_NAMES:
                             fp = tool_input.get("file_path")
                             if isinstance(fp, str):
                                 text = f"{'Writing' if name == 'write_file' else 'Editing'} {fp}"
@@ -1949,9 +2226,7 @@ class Agent:
                             session_id=session_id,
                         ).to_dict()
                     # Minimal tool trace for reasoning summaries. Avoid including raw command strings.
-                    if name in ("write_file", "edit_file") and isinstance(
-                        tool_input, dict
-                    ):
+                    if name in _FILE_WRITE_TOOL_NAMES and isinstance(tool_input, dict):
                         fp = tool_input.get("file_path")
                         if isinstance(fp, str) and fp:
                             tool_trace_for_reason.append(f"{name}: {fp}")
@@ -2102,7 +2377,7 @@ class Agent:
                                 session_id=session_id,
                             ).to_dict()
 
-                if etype in ("on_chat_model_stream", "on_llm_stream"):
+                if etype in _MODEL_STREAM_EVENTS:
                     chunk = data.get("chunk")
                     delta = _chunk_text(chunk)
                     if delta:
@@ -2515,85 +2790,12 @@ class Agent:
         }
 
         # Provide project/git metadata to the controller graph (required for git_sync).
-        try:
-            init_data = self.session_data.get(session_id) or {}
-            proj = init_data.get("project") if isinstance(init_data, dict) else None
-            git = init_data.get("git") if isinstance(init_data, dict) else None
-
-            if isinstance(proj, dict):
-                slug = proj.get("slug")
-                name = proj.get("name")
-                if isinstance(slug, str) and slug:
-                    config["configurable"]["project_slug"] = slug
-                if isinstance(name, str) and name:
-                    config["configurable"]["project_name"] = name
-
-            if isinstance(git, dict):
-                repo_url = git.get("http_url_to_repo") or git.get("repo_http_url")
-                if isinstance(repo_url, str) and repo_url:
-                    config["configurable"]["git_repo_http_url"] = repo_url
-
-                if "git_repo_http_url" not in config["configurable"]:
-                    web_url = git.get("web_url")
-                    if isinstance(web_url, str) and web_url:
-                        url = web_url.rstrip("/")
-                        config["configurable"]["git_repo_http_url"] = (
-                            url if url.endswith(".git") else url + ".git"
-                        )
-
-                pwn = git.get("path_with_namespace")
-                web = git.get("web_url")
-                if isinstance(pwn, str) and pwn:
-                    config["configurable"]["git_path_with_namespace"] = pwn
-                if isinstance(web, str) and web:
-                    config["configurable"]["git_web_url"] = web
-        except Exception:
-            pass
+        config["configurable"].update(self._session_repo_configurable(session_id))
         lf = _langfuse_callback_handler()
         if lf is not None:
             lf.session_id = session_id
             config["callbacks"] = [lf]
 
-        def _chunk_text(chunk: Any) -> str:
-            if chunk is None:
-                return ""
-            content = getattr(chunk, "content", None)
-            if isinstance(content, str):
-                return content
-            if isinstance(content, list):
-                parts: list[str] = []
-                for item in content:
-                    if isinstance(item, str):
-                        parts.append(item)
-                    elif isinstance(item, dict):
-                        text = item.get("text")
-                        if isinstance(text, str):
-                            parts.append(text)
-                return "".join(parts)
-            return ""
-
-        def _message_text(msg: Any) -> str:
-            if msg is None:
-                return ""
-            if isinstance(msg, dict):
-                content = msg.get("content")
-            else:
-                content = getattr(msg, "content", None)
-
-            if isinstance(content, str):
-                return content
-            if isinstance(content, list):
-                parts: list[str] = []
-                for item in content:
-                    if isinstance(item, str):
-                        parts.append(item)
-                    elif isinstance(item, dict):
-                        text = item.get("text")
-                        if isinstance(text, str):
-                            parts.append(text)
-                return "".join(parts)
-            return ""
-
         def _is_ai_message(msg: Any) -> bool:
             if isinstance(msg, dict):
                 t = (msg.get("type") or msg.get("role") or "").lower()
@@ -2621,12 +2823,7 @@ class Agent:
                 name = event.get("name")
                 data = event.get("data") or {}
 
-                if etype == "on_chain_start" and name in (
-                    "qa_validate",
-                    "self_heal_message",
-                    "qa_fail_summary",
-                    "git_sync",
-                ):
+                if etype == "on_chain_start" and name in _CONTROLLER_TRACE_NODES:
                     if name == "git_sync":
                         saw_git_sync = True
                     text = None
@@ -2709,9 +2906,7 @@ class Agent:
                             },
                             session_id=session_id,
                         ).to_dict()
-                    if name in ("write_file", "edit_file") and isinstance(
-                        tool_input, dict
-                    ):
+                    if name in _FILE_WRITE_TOOL_NAMES and isinstance(tool_input, dict):
                         fp = tool_input.get("file_path")
                         if isinstance(fp, str) and fp:
                             tool_trace_for_reason.append(f"{name}: {fp}")
@@ -2862,7 +3057,7 @@ class Agent:
                                 session_id=session_id,
                             ).to_dict()
 
-                if etype in ("on_chat_model_stream", "on_llm_stream"):
+                if etype in _MODEL_STREAM_EVENTS:
                     chunk = data.get("chunk")
                     delta = _chunk_text(chunk)
                     if delta:
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import functools
 import json
 import re
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
 
 # NOTE: Vite dev server treats `/<name>.js` requests as source modules before public assets.
 # Writing to `/amicable-db.js` (workspace root) ensures it is served correctly.
@@ -249,6 +253,12 @@ def render_runtime_js() -> str:
     )
 
 
+@functools.cache
+def render_runtime_js_bytes() -> bytes:
+    """UTF-8 encoded render_runtime_js(); the script is constant per process."""
+    return render_runtime_js().encode("utf-8")
+
+
 def parse_db_js(text: str) -> dict[str, Any] | None:
     if not isinstance(text, str) or "__AMICABLE_DB__" not in text:
         return None
@@ -472,3 +482,38 @@ def runtime_js_path_for_inject_kind(inject_kind: str) -> str:
     if inject_kind == "sveltekit_app_html":
         return "/static/amicable-runtime.js"
     return _PUBLIC_RUNTIME_JS_PATH
+
+
+# inject_kind -> (paths helper, entrypoint patcher). Paths helpers return the
+# db file path plus one entrypoint path or a tuple of candidates.
+_DB_INJECT_TARGETS: dict[
+    str,
+    tuple[Callable[[], tuple[str, str | tuple[str, ...]]], Callable[[str], str]],
+] = {
+    "vite_index_html": (vite_db_paths, ensure_index_includes_db_script),
+    "next_layout_tsx": (next_db_paths, ensure_next_layout_includes_db_script),
+    "remix_root_tsx": (remix_db_paths, ensure_remix_root_includes_db_script),
+    "nuxt_config_ts": (nuxt_db_paths, ensure_nuxt_config_includes_db_script),
+    "sveltekit_app_html": (
+        sveltekit_db_paths,
+        ensure_sveltekit_app_html_includes_db_script,
+    ),
+    "laravel_blade": (laravel_db_paths, ensure_laravel_welcome_includes_db_script),
+}
+
+
+def db_inject_target(
+    inject_kind: str | None,
+) -> tuple[str, tuple[str, ...], Callable[[str], str] | None]:
+    """Return (db_js_path, entry_paths, ensure_entry) for a template inject kind.
+
+    Unknown kinds get the root db file path and no entrypoint to patch.
+    """
+    target = _DB_INJECT_TARGETS.get(inject_kind or "")
+    if target is None:
+        return _VITE_DB_JS_PATH, (), None
+    paths_fn, ensure_entry = target
+    db_js_path, entries = paths_fn()
+    if isinstance(entries, str):
+        entries = (entries,)
+    return db_js_path, entries, ensure_entry
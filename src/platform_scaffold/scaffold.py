@@ -331,7 +331,7 @@ def _dev_commands_for(template_id: str) -> tuple[str, str]:
         )
     if tid == "fastapi":
         return (
-            "pip install -r requirements.txt\nuvicorn app.main:app --reload --host 0.0.0.0 --port 3000",
+            "pip install -r requirements.txt\ngranian --interface asgi --host 0.0.0.0 --port 3000 --loop uvloop --reload app.main:app",
             "python -m compileall -q .\nruff check .\npytest",
         )
     if tid == "laravel":
@@ -13,3 +13,17 @@ if ROOT not in sys.path:
 def _disable_gitlab_requirement_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
     # Most unit tests don't configure GitLab env; keep GitLab enforcement opt-in per test.
     monkeypatch.setenv("AMICABLE_GIT_SYNC_REQUIRED", "0")
+
+
+@pytest.fixture(autouse=True)
+def _reset_agent_env_cache():
+    # src.agent_core memoises env settings; drop them around each test so
+    # monkeypatched env vars take effect and don't leak into later tests.
+    def _reset() -> None:
+        agent_core = sys.modules.get("src.agent_core")
+        if agent_core is not None:
+            agent_core._reset_env_cache()
+
+    _reset()
+    yield
+    _reset()
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import json
 
 import pytest
 
-from src.agent_core import Agent, ChatHistoryPersistenceError
+from src.agent_core import Agent, ChatHistoryPersistenceError, Message, MessageType
 
 
 class _MsgObj:
@@ -151,3 +152,27 @@ def test_ws_history_uses_existing_in_memory_history_without_checkpoint_fetch() -
         {"role": "user", "text": "hello"},
         {"role": "assistant", "text": "hi"},
     ]
+
+
+def test_session_data_with_history_is_json_serializable_for_ws_init() -> None:
+    agent = Agent()
+    session_id = "sess-init-json"
+    agent.session_data[session_id] = {"sandbox_id": "sb", "_conversation_history": []}
+    for i in range(300):
+        agent._append_conversation_turn(session_id, "user", f"message {i}")
+
+    stored = agent.session_data[session_id]["_conversation_history"]
+    assert isinstance(stored, list)
+    assert len(stored) == 250
+    assert stored[0] == {"role": "user", "text": "message 50"}
+
+    agent._maybe_compact_user_text(session_id=session_id, user_text="next")
+    agent._set_conversation_history(session_id, list(stored))
+
+    # ws_server sends session_data as the INIT payload via send_json (json.dumps).
+    payload = Message.new(
+        MessageType.INIT, session_id=session_id, data=agent.session_data[session_id]
+    ).to_dict()
+    decoded = json.loads(json.dumps(payload))
+    assert decoded["type"] == "init"
+    assert isinstance(decoded["data"]["_conversation_history"], list)
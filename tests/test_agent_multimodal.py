@@ -70,3 +70,16 @@ def test_safe_trace_payload_redacts_base64_fields():
     )
     assert payload["base64"].startswith("<redacted:")
     assert payload["nested"]["image_base64"].startswith("<redacted:")
+
+
+def test_safe_trace_payload_truncates_deep_nesting_without_recursion():
+    deep: list = []
+    cur = deep
+    for _ in range(5000):
+        nxt: list = []
+        cur.append(nxt)
+        cur = nxt
+
+    payload = _safe_trace_payload({"type": "file", "data": "abc", "nested": deep})
+    assert payload["data"] == "<redacted:3 chars>"
+    assert payload["nested"] == [[[[["<truncated>"]]]]]
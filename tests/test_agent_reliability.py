@@ -23,7 +23,10 @@ def test_runtime_probe_fails_closed(monkeypatch: pytest.MonkeyPatch) -> None:
     def _monotonic() -> float:
         return clock["t"]
 
+    sleeps: list[float] = []
+
     def _sleep(delta_s: float) -> None:
+        sleeps.append(round(float(delta_s), 3))
         clock["t"] += float(delta_s)
 
     monkeypatch.setenv("K8S_RUNTIME_READY_TIMEOUT_S", "1")
@@ -37,7 +40,9 @@ def test_runtime_probe_fails_closed(monkeypatch: pytest.MonkeyPatch) -> None:
         agent._probe_runtime_or_raise(
             backend=backend, session_id="s1", sandbox_id="sb1"
         )
-    assert backend.calls == 5
+    assert backend.calls == 7
+    # Backoff doubles from 50ms up to the poll interval, clipped at the deadline.
+    assert sleeps == [0.05, 0.1, 0.2, 0.25, 0.25, 0.15]
 
 
 def test_cleanup_session_state_clears_agent_maps() -> None:
@@ -54,6 +59,35 @@ def test_cleanup_session_state_clears_agent_maps() -> None:
     assert sid not in agent._ensure_env_lock_by_session
 
 
+def test_session_repo_configurable_refreshes_when_git_metadata_changes() -> None:
+    agent = Agent()
+    sid = "session-git"
+    agent.session_data[sid] = {
+        "project": {"slug": "demo", "name": "Demo"},
+        "git": {"web_url": "https://gitlab.example/group/demo/"},
+    }
+
+    first = agent._session_repo_configurable(sid)
+    assert first == {
+        "project_slug": "demo",
+        "project_name": "Demo",
+        "git_repo_http_url": "https://gitlab.example/group/demo.git",
+        "git_web_url": "https://gitlab.example/group/demo/",
+    }
+    assert agent._session_repo_configurable(sid) is first
+
+    agent.session_data[sid]["git"] = {
+        "http_url_to_repo": "https://gitlab.example/group/other.git",
+        "path_with_namespace": "group/other",
+    }
+    assert agent._session_repo_configurable(sid) == {
+        "project_slug": "demo",
+        "project_name": "Demo",
+        "git_repo_http_url": "https://gitlab.example/group/other.git",
+        "git_path_with_namespace": "group/other",
+    }
+
+
 def test_no_default_thread_backend_bootstrap_call() -> None:
     src = inspect.getsource(Agent._ensure_deep_agent)
     assert 'get_backend("default-thread")' not in src
@@ -80,3 +114,28 @@ def test_restore_pending_hitl_from_checkpoint_rehydrates() -> None:
     out = asyncio.run(agent.restore_pending_hitl_from_checkpoint("sess-1"))
     assert out is not None
     assert out.get("interrupt_id") == "intr-1"
+
+
+def test_hasura_client_is_per_thread(monkeypatch: pytest.MonkeyPatch) -> None:
+    import threading
+
+    import src.agent_core as agent_core
+    import src.db.provisioning as provisioning
+
+    monkeypatch.setattr(agent_core, "_hasura_local", threading.local())
+    monkeypatch.setattr(provisioning, "hasura_client_from_env", object)
+    agent = Agent()
+
+    main_client = agent._hasura_client()
+    assert agent._hasura_client() is main_client
+
+    seen: list[object] = []
+    worker = threading.Thread(target=lambda: seen.append(agent._hasura_client()))
+    worker.start()
+    worker.join()
+    assert seen and seen[0] is not main_client
+
+    worker_client = agent_core._INIT_IO_POOL.submit(
+        agent_core._call_with_init_hasura, lambda client: client
+    ).result()
+    assert worker_client is not main_client
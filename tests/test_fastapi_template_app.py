@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+from starlette.requests import Request
+
+
+def _load_template_app():
+    repo_root = Path(__file__).resolve().parents[1]
+    main_path = repo_root / "k8s/images/amicable-sandbox-fastapi/app/app/main.py"
+    spec = importlib.util.spec_from_file_location(
+        "amicable_fastapi_template", main_path
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+template = _load_template_app()
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("", False),
+        ("gzip", True),
+        ("gzip, deflate, br", True),
+        ("GZIP;Q=0.5", True),
+        ("x-gzip", True),
+        ("br", False),
+        ("identity", False),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, br", False),
+        ("gzip;q=bogus", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("deflate, *;q=0.1", True),
+        ("gzip;q=0, *", False),
+    ],
+)
+def test_accepts_gzip_honours_q_values(accept_encoding, expected):
+    assert template._accepts_gzip(accept_encoding) is expected
+
+
+def test_root_serves_identity_when_gzip_refused():
+    def _get(accept_encoding: str):
+        request = Request(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": "/",
+                "headers": [(b"accept-encoding", accept_encoding.encode())],
+            }
+        )
+        return asyncio.run(template.root(request))
+
+    assert _get("gzip, br") is template._ROOT_GZ_RESPONSE
+    assert _get("gzip;q=0, br") is template._ROOT_RESPONSE
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+
+def _load_runtime_module():
+    repo_root = Path(__file__).resolve().parents[1]
+    runtime_path = repo_root / "k8s/images/amicable-sandbox-fastapi/runtime.py"
+    spec = importlib.util.spec_from_file_location(
+        "amicable_sandbox_fastapi_runtime", runtime_path
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses looks the defining module up in sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+runtime = _load_runtime_module()
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [("0", {0}), ("0,2-3", {0, 2, 3}), (" 1 , ", {1}), ("", set())],
+)
+def test_parse_cpu_list(raw, expected):
+    assert runtime._parse_cpu_list(raw) == expected
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "sched_setaffinity"), reason="needs sched_setaffinity"
+)
+def test_pin_current_thread_only_affects_launcher_and_its_children():
+    before = os.sched_getaffinity(0)
+    cpu = min(before)
+    seen: dict[str, object] = {}
+
+    def _launcher() -> None:
+        runtime._pin_current_thread(str(cpu))
+        seen["thread"] = os.sched_getaffinity(0)
+        seen["child"] = subprocess.run(
+            [sys.executable, "-c", "import os; print(sorted(os.sched_getaffinity(0)))"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+
+    t = threading.Thread(target=_launcher)
+    t.start()
+    t.join()
+
+    assert seen["thread"] == {cpu}
+    assert seen["child"] == str([cpu])
+    assert os.sched_getaffinity(0) == before
+
+
+def test_pin_current_thread_ignores_unset_and_invalid_values():
+    before = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    runtime._pin_current_thread("")
+    runtime._pin_current_thread("not-a-cpu")
+    if before is not None:
+        assert os.sched_getaffinity(0) == before
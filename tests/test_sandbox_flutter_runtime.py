@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+
+def _load_runtime_module():
+    repo_root = Path(__file__).resolve().parents[1]
+    runtime_path = repo_root / "k8s/images/amicable-sandbox-flutter/runtime.py"
+    spec = importlib.util.spec_from_file_location(
+        "amicable_sandbox_flutter_runtime", runtime_path
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses looks the defining module up in sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+runtime = _load_runtime_module()
+
+
+def _sh(script: str) -> list[str]:
+    return ["sh", "-c", script]
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        [],
+        ["ls", "-la"],
+        ["cat", "lib/main.dart"],
+        _sh("ls lib"),
+        _sh("cd /app && grep -rn 'Widget' lib | head -n 20"),
+        _sh("cat pubspec.yaml; wc -l lib/main.dart"),
+        _sh("rg -n TODO lib || true"),
+        _sh("test -f pubspec.yaml && echo yes"),
+        _sh("ls lib;"),
+        ["bash", "-lc", "pwd"],
+    ],
+)
+def test_read_only_commands(args):
+    assert runtime._is_read_only_command(args) is True
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["flutter", "pub", "get"],
+        ["/tmp/bin/cat", "x"],
+        ["rg", "--pre", "./x.sh", "foo"],
+        _sh("rm -rf lib"),
+        _sh("ls && rm lib/main.dart"),
+        _sh("ls & touch x"),
+        _sh("ls\nsed -i s/a/b/ lib/main.dart"),
+        _sh("echo hi > lib/main.dart"),
+        _sh("echo hi >> lib/main.dart"),
+        _sh("cat <(touch x)"),
+        _sh("cat < lib/main.dart"),
+        _sh("cat <<EOF\nx\nEOF"),
+        _sh("echo $(touch x)"),
+        _sh("echo `touch x`"),
+        _sh("(touch x)"),
+        _sh("{ touch x; }"),
+        _sh("ls \\; touch x"),
+        _sh("FOO=1 ls"),
+        _sh("./cat x"),
+        _sh("grep foo lib | tee out.txt"),
+        _sh("ls | xargs rm"),
+        _sh("rg --pre=./x.sh foo"),
+        _sh("echo x | sh"),
+    ],
+)
+def test_commands_that_may_write(args):
+    assert runtime._is_read_only_command(args) is False
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 from src.db.sandbox_inject import (
+    db_inject_target,
+    ensure_index_includes_db_script,
+    ensure_next_layout_includes_db_script,
     ensure_nuxt_config_includes_db_script,
     render_runtime_js,
+    render_runtime_js_bytes,
 )
 
 
@@ -33,3 +37,23 @@ def test_render_runtime_js_includes_parent_origin_fallbacks():
     assert "amicableParentOrigin" in js
     assert "__amicable_parent_origin" in js
     assert "document.referrer" in js
+
+
+def test_db_inject_target_resolves_paths_and_patcher():
+    assert db_inject_target("vite_index_html") == (
+        "/amicable-db.js",
+        ("/index.html",),
+        ensure_index_includes_db_script,
+    )
+    assert db_inject_target("next_layout_tsx") == (
+        "/public/amicable-db.js",
+        ("/app/layout.tsx", "/src/app/layout.tsx"),
+        ensure_next_layout_includes_db_script,
+    )
+    assert db_inject_target("unknown") == ("/amicable-db.js", (), None)
+    assert db_inject_target(None) == ("/amicable-db.js", (), None)
+
+
+def test_render_runtime_js_bytes_matches_rendered_script():
+    assert render_runtime_js_bytes() == render_runtime_js().encode("utf-8")
+    assert render_runtime_js_bytes() is render_runtime_js_bytes()
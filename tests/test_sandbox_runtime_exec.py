@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import shlex
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+_BASE_RUNTIME_PATH = _REPO_ROOT / "k8s/images/amicable-sandbox/runtime.py"
+_RUNTIME_PATHS = [
+    _BASE_RUNTIME_PATH,
+    *sorted(_REPO_ROOT.glob("k8s/images/amicable-sandbox-*/runtime.py")),
+]
+
+
+def _load_runtime_module(runtime_path: Path = _BASE_RUNTIME_PATH):
+    name = "amicable_runtime_" + runtime_path.parent.name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, runtime_path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses looks the defining module up in sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def runtime(tmp_path, monkeypatch):
+    module = _load_runtime_module()
+    monkeypatch.setattr(module, "APP_ROOT", tmp_path)
+    return module
+
+
+@pytest.fixture(params=_RUNTIME_PATHS, ids=lambda p: p.parent.name)
+def any_runtime(request):
+    return _load_runtime_module(request.param)
+
+
+def test_exec_accepts_long_commands_by_default(runtime, monkeypatch):
+    monkeypatch.delenv("SANDBOX_EXEC_MAX_COMMAND_CHARS", raising=False)
+    runtime._env_int.cache_clear()
+    payload = "x" * 100_000
+    command = "sh -c " + shlex.quote(f"printf %s {payload} | wc -c")
+
+    res = asyncio.run(runtime.exec_cmd(runtime.ExecRequest(command=command)))
+    assert res.exit_code == 0
+    assert res.stdout.strip() == str(len(payload))
+
+
+def test_exec_command_cap_is_opt_in(runtime, monkeypatch):
+    monkeypatch.setenv("SANDBOX_EXEC_MAX_COMMAND_CHARS", "16")
+    runtime._env_int.cache_clear()
+
+    res = asyncio.run(runtime.exec_cmd(runtime.ExecRequest(command="echo " + "y" * 32)))
+    assert res.exit_code == 2
+    assert "command too long" in res.stderr
+
+    res = asyncio.run(runtime.exec_cmd(runtime.ExecRequest(command="echo ok")))
+    assert res.exit_code == 0
+    assert res.stdout == "ok\n"
+
+
+def test_exec_splits_quoted_commands(any_runtime, tmp_path, monkeypatch):
+    monkeypatch.setattr(any_runtime, "APP_ROOT", tmp_path)
+    command = "sh -c " + shlex.quote("printf '%s|' \"$@\"") + " sh 'a b' c"
+
+    res = asyncio.run(any_runtime.exec_cmd(any_runtime.ExecRequest(command=command)))
+    assert res.exit_code == 0
+    assert res.stdout == "a b|c|"
+
+
+def test_run_command_truncates_noisy_stdout_and_stderr(any_runtime, tmp_path):
+    # ~2 MB on each stream, written concurrently and far past the 10k char
+    # capture limit: the drain must keep both pipes flowing so the child never
+    # blocks on a full pipe.
+    script = "(yes e | head -c 2000000 >&2) & yes o | head -c 2000000; wait"
+    stdout, stderr, code = any_runtime._run_command_limited(
+        args=["sh", "-c", script],
+        cwd=str(tmp_path),
+        timeout_s=60,
+        max_output_chars=10_000,
+    )
+
+    assert code == 0
+    assert stdout.endswith("\n<output truncated>")
+    assert stderr.endswith("\n<output truncated>")
+    assert stdout[:10_000] == "o\n" * 5_000
+    assert stderr[:10_000] == "e\n" * 5_000
+    assert len(stdout) == len(stderr) == 10_000 + len("\n<output truncated>")
+
+
+def test_run_command_kills_on_timeout(runtime, tmp_path):
+    stdout, stderr, code = runtime._run_command_limited(
+        args=["sh", "-c", "echo started; exec sleep 30"],
+        cwd=str(tmp_path),
+        timeout_s=1,
+        max_output_chars=10_000,
+    )
+
+    assert code == 124
+    assert stdout == "started\n"
+    assert "timed out" in stderr
+
+
+@pytest.mark.skipif(not hasattr(os, "splice"), reason="needs os.splice")
+@pytest.mark.parametrize("splice_works", [True, False])
+def test_run_command_splices_surplus_output(
+    any_runtime, tmp_path, monkeypatch, splice_works
+):
+    real_splice = os.splice
+    calls = []
+
+    def _splice(*args, **kwargs):
+        calls.append(args)
+        if not splice_works:
+            raise OSError(22, "Invalid argument")
+        return real_splice(*args, **kwargs)
+
+    monkeypatch.setattr(os, "splice", _splice)
+    stdout, stderr, code = any_runtime._run_command_limited(
+        args=["sh", "-c", "yes o | head -c 4000000"],
+        cwd=str(tmp_path),
+        timeout_s=60,
+        max_output_chars=10_000,
+    )
+
+    assert code == 0
+    assert stdout[:10_000] == "o\n" * 5_000
+    assert stdout.endswith("\n<output truncated>")
+    assert stderr == ""
+    # Surplus output goes through splice; after one failure the drain falls
+    # back to readv for the rest of the command.
+    if splice_works:
+        assert calls
+    else:
+        assert len(calls) == 1
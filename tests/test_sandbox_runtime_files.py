@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+_BASE_RUNTIME_PATH = _REPO_ROOT / "k8s/images/amicable-sandbox/runtime.py"
+_TEMPLATE_RUNTIME_PATHS = sorted(
+    _REPO_ROOT.glob("k8s/images/amicable-sandbox-*/runtime.py")
+)
+
+
+def _load_runtime_module(runtime_path: Path):
+    name = "amicable_runtime_" + runtime_path.parent.name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, runtime_path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses looks the defining module up in sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=_TEMPLATE_RUNTIME_PATHS, ids=lambda p: p.parent.name)
+def runtime(request, tmp_path, monkeypatch):
+    module = _load_runtime_module(request.param)
+    app_root = tmp_path / "app"
+    app_root.mkdir()
+    monkeypatch.setattr(module, "APP_ROOT", app_root)
+    return module
+
+
+@pytest.fixture
+def base_runtime(tmp_path, monkeypatch):
+    module = _load_runtime_module(_BASE_RUNTIME_PATH)
+    app_root = tmp_path / "app"
+    app_root.mkdir()
+    monkeypatch.setattr(module, "APP_ROOT", app_root)
+    return module
+
+
+@pytest.fixture(
+    params=[_BASE_RUNTIME_PATH, *_TEMPLATE_RUNTIME_PATHS], ids=lambda p: p.parent.name
+)
+def any_runtime(request, tmp_path, monkeypatch):
+    module = _load_runtime_module(request.param)
+    app_root = tmp_path / "app"
+    app_root.mkdir()
+    monkeypatch.setattr(module, "APP_ROOT", app_root)
+    return module
+
+
+def _list(runtime, dir: str = "src") -> list[str]:
+    return asyncio.run(runtime.list_files(dir=dir))["files"]
+
+
+def test_list_sees_file_created_right_after_listing(runtime):
+    src = runtime.APP_ROOT / "src"
+    src.mkdir()
+    (src / "a.ts").write_text("a")
+    assert _list(runtime) == ["src/a.ts"]
+
+    (src / "b.ts").write_text("b")
+    assert _list(runtime) == ["src/a.ts", "src/b.ts"]
+
+
+def test_list_not_fooled_by_coarse_mtime_ticks(runtime):
+    src = runtime.APP_ROOT / "src"
+    src.mkdir()
+    # Emulate a filesystem with one-second timestamps: both changes below land
+    # in the same tick, so the directory mtime does not move.
+    tick_ns = time.time_ns() // 1_000_000_000 * 1_000_000_000
+    (src / "a.ts").write_text("a")
+    os.utime(src, ns=(tick_ns, tick_ns))
+    assert _list(runtime) == ["src/a.ts"]
+
+    (src / "b.ts").write_text("b")
+    os.utime(src, ns=(tick_ns, tick_ns))
+    assert _list(runtime) == ["src/a.ts", "src/b.ts"]
+
+
+def test_list_caches_settled_directories(runtime):
+    src = runtime.APP_ROOT / "src"
+    src.mkdir()
+    (src / "a.ts").write_text("a")
+    old_ns = time.time_ns() - 60 * 1_000_000_000
+    os.utime(src, ns=(old_ns, old_ns))
+
+    assert _list(runtime) == ["src/a.ts"]
+    assert str(src) in runtime._list_cache
+
+    (src / "b.ts").write_text("b")
+    assert _list(runtime) == ["src/a.ts", "src/b.ts"]
+
+
+def _write_b64(runtime, path: str, content_b64: str) -> dict:
+    req = runtime.WriteB64Request(path=path, content_b64=content_b64)
+    return asyncio.run(runtime.write_b64(req))
+
+
+def test_write_b64_streams_large_payload(base_runtime):
+    payload = os.urandom(3 * base_runtime._B64_STREAM_MIN // 2)
+    target = base_runtime.APP_ROOT / "assets" / "blob.bin"
+
+    res = _write_b64(
+        base_runtime, "assets/blob.bin", base64.b64encode(payload).decode()
+    )
+
+    assert res["ok"] is True
+    assert target.read_bytes() == payload
+    assert target.stat().st_mode & 0o777 == 0o666 & ~base_runtime._UMASK
+    assert sorted(p.name for p in target.parent.iterdir()) == ["blob.bin"]
+
+
+def test_write_b64_streamed_keeps_file_mode(base_runtime):
+    target = base_runtime.APP_ROOT / "run.sh"
+    target.write_bytes(b"old")
+    target.chmod(0o755)
+    payload = b"#" * base_runtime._B64_STREAM_MIN
+
+    _write_b64(base_runtime, "run.sh", base64.b64encode(payload).decode())
+
+    assert target.read_bytes() == payload
+    assert target.stat().st_mode & 0o777 == 0o755
+
+
+def test_write_b64_invalid_large_payload_leaves_target_untouched(base_runtime):
+    from fastapi import HTTPException
+
+    target = base_runtime.APP_ROOT / "data.bin"
+    target.write_bytes(b"original")
+    good = base64.b64encode(b"x" * base_runtime._B64_STREAM_MIN).decode()
+
+    with pytest.raises(HTTPException) as exc_info:
+        _write_b64(base_runtime, "data.bin", good + "!!!!")
+
+    assert exc_info.value.status_code == 400
+    assert target.read_bytes() == b"original"
+    assert [p.name for p in base_runtime.APP_ROOT.iterdir()] == ["data.bin"]
+
+
+def test_iter_file_b64_streams_file_and_reports_open_errors(any_runtime):
+    payload = os.urandom(any_runtime._DOWNLOAD_B64_CHUNK * 2 + 5)
+    big = any_runtime.APP_ROOT / "big.bin"
+    big.write_bytes(payload)
+
+    body = b"".join(any_runtime._iter_file_b64(b'{"path":"big.bin"', str(big)))
+    item = json.loads(body)
+    assert item["error"] is None
+    assert base64.b64decode(item["content_b64"]) == payload
+
+    missing = any_runtime.APP_ROOT / "missing.bin"
+    body = b"".join(any_runtime._iter_file_b64(b'{"path":"missing.bin"', str(missing)))
+    item = json.loads(body)
+    assert item["content_b64"] is None
+    assert item["error"] == "file_not_found"
+
+
+def test_filesystem_work_runs_on_bounded_named_pools(any_runtime):
+    def _thread_name() -> str:
+        return threading.current_thread().name
+
+    io_name = asyncio.run(any_runtime._run_in_pool(any_runtime._io_pool, _thread_name))
+    cpu_name = asyncio.run(
+        any_runtime._run_in_pool(any_runtime._cpu_pool, _thread_name)
+    )
+
+    assert io_name.startswith("sandbox-io")
+    assert cpu_name.startswith("sandbox-cpu")
+    assert any_runtime._cpu_pool._max_workers == (os.cpu_count() or 1)
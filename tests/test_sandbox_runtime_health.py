@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import importlib.util
+import sys
 from pathlib import Path
 
 import pytest
@@ -16,6 +17,8 @@ def _load_runtime_module():
     spec = importlib.util.spec_from_file_location("amicable_sandbox_runtime", runtime_path)
     assert spec is not None and spec.loader is not None
     module = importlib.util.module_from_spec(spec)
+    # dataclasses looks the defining module up in sys.modules.
+    sys.modules[spec.name] = module
     spec.loader.exec_module(module)
     return module
 
@@ -56,3 +59,15 @@ def test_readyz_requires_running_preview():
     bad_payload = asyncio.run(runtime.readyz(bad_response))
     assert bad_response.status_code == 503
     assert bad_payload["status"] == "not_ready"
+
+
+def test_preview_snapshot_is_reused_until_state_changes():
+    runtime = _load_runtime_module()
+    first = runtime._preview_state_snapshot()  # type: ignore[attr-defined]
+    assert runtime._preview_state_snapshot() is first  # type: ignore[attr-defined]
+
+    runtime._preview_state_update(running_pid=4321)  # type: ignore[attr-defined]
+    second = runtime._preview_state_snapshot()  # type: ignore[attr-defined]
+    assert second is not first
+    assert second["running_pid"] == 4321
+    assert second["running"] is True
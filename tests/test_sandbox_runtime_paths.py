@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+_REPO_ROOT = Path(__file__).resolve().parents[1]
+_RUNTIME_PATHS = [
+    _REPO_ROOT / "k8s/images/amicable-sandbox/runtime.py",
+    *sorted(_REPO_ROOT.glob("k8s/images/amicable-sandbox-*/runtime.py")),
+]
+
+
+def _load_runtime_module(runtime_path: Path):
+    name = "amicable_runtime_" + runtime_path.parent.name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, runtime_path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses looks the defining module up in sys.modules.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(params=_RUNTIME_PATHS, ids=lambda p: p.parent.name)
+def runtime(request, tmp_path, monkeypatch):
+    module = _load_runtime_module(request.param)
+    app_root = tmp_path / "app"
+    app_root.mkdir()
+    monkeypatch.setattr(module, "APP_ROOT", app_root)
+    return module
+
+
+def test_safe_path_accepts_paths_inside_app(runtime):
+    root = runtime.APP_ROOT
+    (root / "src").mkdir()
+    (root / "inner").symlink_to(root / "src")
+
+    assert runtime._safe_path("src/main.ts") == root / "src" / "main.ts"
+    assert runtime._safe_path("/new/dir/file.txt") == root / "new" / "dir" / "file.txt"
+    assert runtime._safe_path("inner/f") == root / "src" / "f"
+
+
+@pytest.mark.parametrize(
+    "rel_path", ["../etc/passwd", "a/../../x", "link/f", "link", "deep/link/f"]
+)
+def test_safe_path_rejects_escapes(runtime, tmp_path, rel_path):
+    root = runtime.APP_ROOT
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "f").write_text("secret")
+    (root / "link").symlink_to(outside)
+    (root / "deep").mkdir()
+    (root / "deep" / "link").symlink_to(outside)
+
+    with pytest.raises(ValueError, match="escapes"):
+        runtime._safe_path(rel_path)
+
+
+def test_safe_path_rejects_empty(runtime):
+    with pytest.raises(ValueError, match="empty"):
+        runtime._safe_path("  /")